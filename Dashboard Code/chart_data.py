@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+MAX_POINTS = 500  # point budget per chart before LTTB kicks in
+
+
+def collapse_flat_runs(hist: pd.DataFrame) -> pd.DataFrame:
+    """
+    Keep only the first day of each run of unchanged prices, plus the last day.
+    Drawn with a step ("hv") line this is identical to plotting every day,
+    since prices are flat between changes.
+    """
+    if len(hist) <= 2:
+        return hist
+    price = hist["price"].to_numpy()
+    keep = np.empty(len(price), dtype=bool)
+    keep[0] = True
+    keep[1:] = price[1:] != price[:-1]
+    keep[-1] = True
+    return hist[keep]
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+    Returns the indices of the points to keep (always includes first and last).
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # Bucket edges over the interior points (first and last are fixed)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    keep = np.empty(threshold, dtype=int)
+    keep[0] = 0
+    keep[-1] = n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point for the final bucket)
+        nxt_start, nxt_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[nxt_start:nxt_end].mean()
+        avg_y = y[nxt_start:nxt_end].mean()
+
+        # Point in this bucket forming the largest triangle with a and the next average
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+def chart_points(hist: pd.DataFrame, max_points: int = MAX_POINTS) -> pd.DataFrame:
+    """Collapse flat runs, then LTTB-downsample if still over the point budget."""
+    pts = collapse_flat_runs(hist.sort_values("date").reset_index(drop=True))
+    if len(pts) > max_points:
+        x = pd.to_datetime(pts["date"]).to_numpy().astype("int64").astype(float)
+        y = pts["price"].to_numpy(dtype=float)
+        pts = pts.iloc[lttb(x, y, max_points)]
+    return pts
+
+
+def build_price_figure(hist: pd.DataFrame, max_points: int = MAX_POINTS):
+    hist_plot = chart_points(hist, max_points).copy()
+    hist_plot["date"] = pd.to_datetime(hist_plot["date"])
+    hist_plot["price"] = pd.to_numeric(hist_plot["price"])
+
+    fig = px.line(
+        hist_plot,
+        x="date",
+        y="price",
+        labels={"date": "Date", "price": "Price ($)"},
+        line_shape="hv",
+    )
+
+    fig.update_traces(
+        hovertemplate="<b>%{x|%b %d, %Y}</b><br>Price: %{y:$,.2f}<extra></extra>",
+        mode="lines+markers",
+        marker=dict(size=8, line=dict(width=1.5, color="white")),
+        line=dict(width=4),
+    )
+
+    fig.update_layout(
+        height=400,
+        margin=dict(l=20, r=20, t=20, b=20),
+        font=dict(size=20),
+        hoverlabel=dict(font_size=18),
+        xaxis=dict(title_font=dict(size=22), tickfont=dict(size=18)),
+        yaxis=dict(title_font=dict(size=22), tickfont=dict(size=18), tickprefix="$"),
+    )
+    return fig
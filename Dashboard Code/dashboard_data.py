@@ -0,0 +1,209 @@
+import re
+import json
+import glob
+import os
+import threading
+from pathlib import Path
+
+# Search rules are shared with query_service
+from search_tokens import normalize_text_to_tokens, product_matches_tokens, query_tokens
+
+BASE_DIR = Path(__file__).resolve().parents[1] / "data"
+# Compacted store (see compact_data.py); the published repo has it instead of raw/combined CSVs
+STORE_DIR = Path(__file__).resolve().parents[1] / "store"
+
+ICON_URL = "https://play-lh.googleusercontent.com/m3a7lbOgH4dSrn1eP5MvXef0MiWlnR_4B6zvsuyrvUxTgS4WC-jI2pd8FN5E-PL0tQ=w240-h480-rw"
+ICON_PATH = Path(__file__).resolve().parent / "assets" / "aldi_icon.png"
+FALLBACK_ICON = "🛒"
+# Streamlit reruns the script on every interaction; fetch the icon once per process
+_icon_fetch_lock = threading.Lock()
+_icon_fetch_started = False
+
+# Region the dashboard shows; get_prices reads this region's files only
+DASHBOARD_REGION = "default"
+
+EXPECTED_ANOMALY_COLS = [
+    "brand",
+    "name",
+    "weight",
+    "latest_date",
+    "latest_price",
+    "median_price_30d",
+    "pct_diff_vs_30d_median",
+    "direction",
+    "reason",
+]
+
+
+def _fetch_icon(url: str, path: Path):
+    """Download the icon and cache it on disk for the next start."""
+    try:
+        import requests
+        from io import BytesIO
+        from PIL import Image
+
+        response = requests.get(url, timeout=10)
+        response.raise_for_status()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        Image.open(BytesIO(response.content)).save(tmp, format="PNG")
+        os.replace(tmp, path)
+    except Exception:
+        # Icon is cosmetic; a failed fetch just means we use the fallback again
+        pass
+
+
+def get_page_icon(path: Path = ICON_PATH, url: str = ICON_URL):
+    """
+    Return the page icon without touching the network on the critical path.
+    Uses the bundled/cached PNG if present; otherwise returns an emoji and
+    fills the cache in a background thread. Only the first miss in a process
+    starts that thread; a failed fetch is retried on the next start.
+    """
+    global _icon_fetch_started
+    if path.is_file():
+        return str(path)
+    with _icon_fetch_lock:
+        if not _icon_fetch_started:
+            _icon_fetch_started = True
+            threading.Thread(target=_fetch_icon, args=(url, path), daemon=True).start()
+    return FALLBACK_ICON
+
+
+def data_version(base_dir: Path = BASE_DIR) -> str:
+    """
+    Cheap token that changes whenever a new day is scraped or the newest day
+    folder is rewritten. Used as a cache key for per-product results.
+    """
+    days = [p for p in base_dir.iterdir() if p.is_dir() and re.fullmatch(r"\d{8}", p.name)]
+    if not days:
+        return ""
+    newest = max(days, key=lambda p: p.name)
+    return f"{newest.name}:{newest.stat().st_mtime_ns}"
+
+
+def find_csv_with_prefix(folder, prefix, ext="csv"):
+    pattern = os.path.join(folder, f"{prefix}*.{ext}")
+    matches = glob.glob(pattern)
+    return matches[0] if matches else None
+
+
+def load_combined(combined_path):
+    import pandas as pd
+
+    combined = pd.read_csv(combined_path)
+    if "region" in combined.columns:
+        combined = combined[combined["region"] == DASHBOARD_REGION].reset_index(drop=True)
+    return _clean_combined(combined)
+
+
+def load_store_combined(store_dir: Path = STORE_DIR, end=None, days: int = 30):
+    """
+    The same frame as load_combined, built from the compacted store's last
+    `days` days up to end (default: the newest stored day). Used when the
+    combined CSV isn't there, e.g. in the published repo.
+    """
+    from datetime import datetime, timedelta
+    from compact_data import load_manifest, load_prices
+
+    keys = sorted(load_manifest(store_dir)["days"])
+    if not keys:
+        raise FileNotFoundError(f"No days in the store at {store_dir}")
+    end = end or datetime.strptime(keys[-1], "%Y%m%d").date()
+    combined = load_prices(store_dir, end - timedelta(days=days), end, region=DASHBOARD_REGION)
+    return _clean_combined(combined[["brand", "name", "weight", "price", "date"]])
+
+
+def _clean_combined(combined):
+    import pandas as pd
+
+    # Clean up price and date
+    if "price" in combined.columns:
+        combined["price"] = (
+            combined["price"]
+            .astype(str)
+            .str.replace(r"[$,]", "", regex=True)
+            .astype(float)
+        )
+
+    if "date" in combined.columns:
+        combined["date"] = pd.to_datetime(combined["date"]).dt.date
+
+    # Make a display column for search
+    for col in ["brand", "name"]:
+        if col not in combined.columns:
+            combined[col] = ""
+
+    combined["brand"] = combined["brand"].fillna("")
+    combined["name"] = combined["name"].fillna("")
+    combined["display"] = (combined["brand"] + " " + combined["name"]).str.strip()
+    return combined
+
+
+def build_products(combined):
+    products = combined[["brand", "name", "display"]].drop_duplicates().reset_index(drop=True)
+    # Precompute tokens for each product display string
+    products["tokens"] = products["display"].apply(normalize_text_to_tokens)
+    return products
+
+
+def load_anomalies(anomalies_path):
+    """Read the anomalies CSV; raises ValueError if expected columns are missing."""
+    import pandas as pd
+
+    anoms = pd.read_csv(anomalies_path)
+    if "region" in anoms.columns:
+        anoms = anoms[anoms["region"] == DASHBOARD_REGION].reset_index(drop=True)
+
+    missing = [c for c in EXPECTED_ANOMALY_COLS if c not in anoms.columns]
+    if missing:
+        raise ValueError(f"Missing expected columns in anomalies CSV: {missing}")
+
+    # Clean pct_diff_vs_30d_median and latest_price
+    anoms["pct_diff_vs_30d_median"] = (
+        anoms["pct_diff_vs_30d_median"]
+        .astype(str)
+        .str.replace("%", "", regex=False)
+        .astype(float)
+    )
+    anoms["latest_price"] = (
+        anoms["latest_price"]
+        .astype(str)
+        .str.replace(r"[$,]", "", regex=True)
+        .astype(float)
+    )
+    return anoms
+
+
+def load_movers_feed(feed_path):
+    """
+    (deals, hikes) from the movers feed movers_feed.py writes: already typed,
+    sorted and capped, with each card's sparkline in the "spark" column.
+    """
+    import pandas as pd
+
+    with open(feed_path, "r", encoding="utf-8") as f:
+        feed = json.load(f)
+    lists = feed["regions"].get(DASHBOARD_REGION, {})
+    cols = EXPECTED_ANOMALY_COLS + ["spark"]
+    return (
+        pd.DataFrame(lists.get("deals", []), columns=cols),
+        pd.DataFrame(lists.get("hikes", []), columns=cols),
+    )
+
+
+def search_products(products, query: str):
+    """Return the rows of products matching ALL tokens in query (empty if none)."""
+    if not query.strip():
+        return products.iloc[0:0].copy()
+
+    # Turn query into token set with same rules as products
+    wanted = query_tokens(query)
+    if not wanted:
+        return products.iloc[0:0].copy()
+
+    # A product matches only if it matches ALL query tokens (with partial-token logic)
+    mask = products["tokens"].apply(
+        lambda ts: product_matches_tokens(ts, wanted)
+    )
+    return products[mask].copy()
@@ -0,0 +1,317 @@
+import os
+import streamlit as st
+from dashboard_data import (
+    STORE_DIR,
+    build_products,
+    load_anomalies,
+    load_combined,
+    load_movers_feed,
+    load_store_combined,
+    search_products,
+)
+
+# Each panel is an st.fragment: a widget inside it only reruns that panel,
+# not the whole page. Inputs come from st.cache_data so a rerun never
+# re-reads or re-cleans the CSVs.
+
+LIST_HEIGHT = 300  
+MAX_CARDS = 30
+SPARK_WIDTH = 240
+SPARK_HEIGHT = 36
+
+
+@st.cache_data(show_spinner=False)
+def cached_products(combined_path, mtime):
+    # mtime is part of the cache key so a rewritten CSV is picked up
+    return build_products(load_combined(combined_path))
+
+
+@st.cache_data(show_spinner=False)
+def cached_store_products(store_dir, mtime):
+    # Published repos ship the store instead of the combined CSV
+    return build_products(load_store_combined(store_dir))
+
+
+@st.cache_data(show_spinner=False)
+def cached_anomalies(anomalies_path, mtime):
+    return load_anomalies(anomalies_path)
+
+
+@st.cache_data(show_spinner=False)
+def cached_movers(anomalies_path, mtime):
+    """Return (deals, hikes) already filtered, sorted and capped for the cards."""
+    anoms = cached_anomalies(anomalies_path, mtime)
+    deals = (
+        anoms[anoms["pct_diff_vs_30d_median"] < 0]
+        .sort_values("pct_diff_vs_30d_median")  # most negative first
+        .head(MAX_CARDS)
+    )
+    hikes = (
+        anoms[anoms["pct_diff_vs_30d_median"] > 0]
+        .sort_values("pct_diff_vs_30d_median", ascending=False)
+        .head(MAX_CARDS)
+    )
+    return deals, hikes
+
+
+@st.cache_data(show_spinner=False)
+def cached_feed(feed_path, mtime):
+    """(deals, hikes) straight from the pipeline's movers feed, sparklines included."""
+    return load_movers_feed(feed_path)
+
+
+def make_dashboard(brand, name):
+    # single_dashboard pulls in pandas + plotly; only pay for it once a product is picked
+    from single_dashboard import make_dashboard as _make_dashboard
+    _make_dashboard(brand, name)
+
+
+@st.fragment
+def search_panel(combined_path=None):
+    """Search box over the combined CSV, or over the store when combined_path is None."""
+    st.header("Search products")
+
+    query = st.text_input(
+        "Search by words in brand and name (order and case don’t matter, partial words allowed):",
+        placeholder="e.g. chicken breast, blueberries pint, clancy and chips...",
+        key="search_query",
+    )
+
+    with st.spinner("Loading price data..."):
+        if combined_path is not None:
+            products = cached_products(combined_path, os.path.getmtime(combined_path))
+        else:
+            manifest = STORE_DIR / "manifest.json"
+            products = cached_store_products(STORE_DIR, os.path.getmtime(manifest))
+
+    results = search_products(products, query)
+
+    if not results.empty:
+        st.write(f"Found **{len(results)}** matching product(s).")
+
+        max_show = 50
+        show_df = results.sort_values("display").head(max_show)
+        display_options = show_df["display"].tolist()
+
+        selected_display = st.selectbox(
+            "Pick a product:",
+            options=[""] + display_options,  # "" = no selection yet
+            index=0,
+            key="product_select",
+        )
+
+        if selected_display:
+            chosen_row = show_df[show_df["display"] == selected_display].iloc[0]
+            chosen_brand = chosen_row["brand"]
+            chosen_name = chosen_row["name"]
+            make_dashboard(chosen_brand, chosen_name)
+
+    else:
+        if query.strip():
+            st.info("No matches found. Try changing or removing a word.")
+
+
+def _card_styles():
+    st.markdown(
+        f"""
+        <style>
+        /* Make Streamlit columns scroll vertically once they exceed LIST_HEIGHT */
+        div[data-testid="stLayoutWrapper"] {{
+            max-height: {LIST_HEIGHT}px;
+            overflow-y: auto;
+            padding-right: 4px;
+        }}
+
+        /* Default (light mode): dark text */
+        .price-card-brand,
+        .price-card-name,
+         .current-price {{
+            color: #111827;
+        }}
+
+        /* Dark mode: force brand + name to white */
+        @media (prefers-color-scheme: dark) {{
+            .price-card-brand,
+            .price-card-name,
+            .current-price {{
+                color: #ffffff !important;
+            }}
+        }}
+        </style>
+        """,
+        unsafe_allow_html=True,
+    )
+
+
+def _sparkline_svg(spark, color: str) -> str:
+    """Inline SVG step line of a card's recent prices; "" with fewer than two points."""
+    from datetime import date
+
+    if not isinstance(spark, dict) or len(spark.get("prices", [])) < 2:
+        return ""
+    days = [date.fromisoformat(d).toordinal() for d in spark["dates"]]
+    prices = spark["prices"]
+    lo, hi = min(prices), max(prices)
+    span_x = max(days[-1] - days[0], 1)
+    span_y = (hi - lo) or 1.0
+
+    def x(d):
+        return 2 + (d - days[0]) / span_x * (SPARK_WIDTH - 4)
+
+    def y(p):
+        # A flat history sits in the middle instead of on the bottom edge
+        return SPARK_HEIGHT / 2 if hi == lo else 2 + (hi - p) / span_y * (SPARK_HEIGHT - 4)
+
+    # Prices hold until the next observation, so draw steps rather than slopes
+    path = f"M{x(days[0]):.1f},{y(prices[0]):.1f}"
+    for d, p in zip(days[1:], prices[1:]):
+        path += f" H{x(d):.1f} V{y(p):.1f}"
+    return (
+        f'<svg width="100%" height="{SPARK_HEIGHT}" viewBox="0 0 {SPARK_WIDTH} {SPARK_HEIGHT}" '
+        f'preserveAspectRatio="none" style="display:block;margin-top:6px;">'
+        f'<path d="{path}" fill="none" stroke="{color}" stroke-width="2" vector-effect="non-scaling-stroke"/>'
+        f'<circle cx="{x(days[-1]):.1f}" cy="{y(prices[-1]):.1f}" r="3" fill="{color}"/></svg>'
+    )
+
+
+def render_price_cards(df, kind: str):
+    """
+    kind = 'deal' or 'hike'
+    Renders up to MAX_CARDS rows from df as clickable cards.
+    Clicking a card's button stores the chosen brand + name in session_state.
+    Rows from the movers feed carry a "spark" column, drawn as a mini-chart.
+    """
+    import pandas as pd
+
+    is_deal = (kind == "deal")
+    color = "#16a34a" if is_deal else "#dc2626"  # green / red
+    label_text = "Good deal" if is_deal else "Price hike"
+
+    keep_cols = [
+        "brand",
+        "name",
+        "weight",
+        "latest_price",
+        "median_price_30d",
+        "pct_diff_vs_30d_median",
+    ]
+    if "reason" in df.columns:
+        keep_cols.append("reason")
+    if "spark" in df.columns:
+        keep_cols.append("spark")
+
+    df = df[keep_cols].reset_index(drop=True).head(MAX_CARDS)
+
+    for i, row in df.iterrows():
+        brand = row["brand"]
+        name = row["name"]
+        latest_price = row["latest_price"]
+        median_price_30d = row["median_price_30d"]
+        pct_diff = row["pct_diff_vs_30d_median"]
+
+        pct_str = f"{pct_diff:.0f}%"  # e.g. -33 -> "-33%"
+        spark_html = _sparkline_svg(row["spark"], color) if "spark" in row else ""
+
+        reason_html = ""
+        if "reason" in row and pd.notna(row["reason"]):
+            reason_html = f"""
+            <div style="margin-top:4px;font-size:12px;color:#6b7280;">
+                {row["reason"]}
+            </div>
+            """
+
+        st.markdown(
+            f"""
+            <div style="
+                border-radius:12px;
+                padding:10px 14px;
+                margin-bottom:10px;
+                border:1px solid #e5e7eb;
+                box-shadow:0 1px 3px rgba(0,0,0,0.06);
+                background-color:white;
+            ">
+            <div class="price-card-brand" style="font-weight:600;margin-bottom:2px;">
+                {brand}
+            </div>
+            <div class="price-card-name" style="font-size:20px;margin-bottom:4px;">
+                {name}
+            </div>
+
+              <div class="current-price" style="margin-top:4px;font-size:20px;">
+                <span>Current:</span>
+                <span style="font-weight:600;">${latest_price:.2f}</span>
+                <span style="font-size:16px;color:#6b7280;">
+                    (30d median ${median_price_30d:.2f})
+                </span>
+              </div>
+              <div style="margin-top:4px;font-size:20px;">
+                <span style="font-weight:600;color:{color};">
+                    {label_text}: {pct_str}
+                </span>
+              </div>
+              {spark_html}
+
+            </div>
+            """,
+            unsafe_allow_html=True,
+        )
+
+        if st.button(
+            "View dashboard",
+            key=f"{kind}_card_btn_{i}",
+            help=f"Open dashboard for {brand} - {name}",
+            use_container_width=True,
+        ):
+            st.session_state["selected_brand"] = brand
+            st.session_state["selected_name"] = name
+
+
+@st.fragment
+def movers_panel(anomalies_path, feed_path=None):
+    """
+    Price-mover cards plus the full-width dashboard they open.
+    A card click only reruns this fragment; the search panel is untouched.
+    Cards come from the movers feed when there is one, else from the anomalies CSV.
+    """
+    st.header("Recent price movers (based on 30-day median)")
+    _card_styles()
+
+    try:
+        if feed_path is not None:
+            deals, hikes = cached_feed(feed_path, os.path.getmtime(feed_path))
+        else:
+            deals, hikes = cached_movers(anomalies_path, os.path.getmtime(anomalies_path))
+    except ValueError as e:
+        st.error(str(e))
+        return
+
+    header_deal, header_hike = st.columns(2)
+    with header_deal:
+        st.subheader("Best deals (cheaper than usual)")
+    with header_hike:
+        st.subheader("Biggest jumps (more expensive than usual)")
+    col_deals, col_hikes = st.columns(2)
+
+    with col_deals:
+        if deals.empty:
+            st.write("There are no great deals right now.")
+        else:
+            render_price_cards(deals, kind="deal")
+
+    with col_hikes:
+        if hikes.empty:
+            st.write("There were no recent price hikes.")
+        else:
+            render_price_cards(hikes, kind="hike")
+
+    # ----------------- FULL-WIDTH DASHBOARD AREA ----------------- #
+
+    st.markdown("---")
+
+    if "selected_brand" in st.session_state and "selected_name" in st.session_state:
+        chosen_brand = st.session_state["selected_brand"]
+        chosen_name = st.session_state["selected_name"]
+
+        make_dashboard(chosen_brand, chosen_name)
+    else:
+        st.info("Click a product card above to open its dashboard.")
@@ -1,28 +1,49 @@
-import re
-import csv
 from pathlib import Path
-from datetime import datetime, date
+from datetime import date, datetime
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 
+from csv_reader import DEFAULT_WORKERS, list_raw_csvs, read_csv
+from compact_data import load_manifest, load_prices, load_products
 
-def get_prices(TARGET_BRAND, TARGET_NAME):
+# Product histories start here; the data/ folders from before it are left out
+HISTORY_START = date(2025, 10, 9)
 
-    BASE_DIR = Path(__file__).resolve().parents[1] / "data" 
-    START = date(2025, 10, 9)
 
+def store_prices(TARGET_BRAND, TARGET_NAME, store_dir, days):
+    """
+    (price, source, weight) per day for the days given, read from the compacted
+    store. Used for days whose raw CSVs aren't on disk (the published repo only
+    carries the store).
+    """
+    products = load_products(store_dir)
+    if TARGET_BRAND != '':
+        match = products[(products["brand"] == TARGET_BRAND) & (products["name"] == TARGET_NAME)]
+    else:
+        match = products[products["name"] == TARGET_NAME]
+    if match.empty or not days:
+        return {d: (None, None, None) for d in days}
 
-    END = date.today()  # inclusive
+    stored = load_prices(store_dir, min(days), max(days), product_ids=match["product_id"], region="default")
+    stored = stored.sort_values(["date", "product_id"], kind="mergesort").drop_duplicates("date")
+    by_date = {pd.Timestamp(r.date).date(): r for r in stored.itertuples(index=False)}
+    out = {}
+    for d in days:
+        r = by_date.get(d)
+        out[d] = (float(r.price), f"{d:%Y%m%d}.parquet", r.weight) if r is not None else (None, None, None)
+    return out
 
 
+def get_prices(TARGET_BRAND, TARGET_NAME, base_dir=None, start=HISTORY_START, end=None, store_dir=None):
+
+    BASE_DIR = Path(base_dir) if base_dir else Path(__file__).resolve().parents[1] / "data"
+    STORE_DIR = Path(store_dir) if store_dir else BASE_DIR.parent / "store"
+    START = start
+
+
+    END = end or date.today()  # inclusive
+
 
-    def parse_date_folder(folder_name: str):
-        """Return a date from a 'YYYYMMDD' folder name or None if not valid."""
-        if not re.fullmatch(r"\d{8}", folder_name):
-            return None
-        try:
-            return datetime.strptime(folder_name, "%Y%m%d").date()
-        except ValueError:
-            return None
 
     def clean_price(val):
         """Convert prices like '$2.49', '2,49', '2.49 ' -> float. Returns None if not parseable."""
@@ -38,31 +59,10 @@ def get_prices(TARGET_BRAND, TARGET_NAME):
         except ValueError:
             return None
 
-    def read_csv_any_encoding(path: Path) -> pd.DataFrame:
-        """Try a few common encodings and return a DataFrame (empty if all fail)."""
-        for enc in ("utf-8", "utf-8-sig", "cp1252"):
-            try:
-                return pd.read_csv(path, encoding=enc)
-            except Exception:
-                continue
-        # Last resort: Python's csv with latin-1 then to DataFrame
-        try:
-            with path.open("r", encoding="latin-1", newline="") as f:
-                reader = list(csv.reader(f))
-            if not reader:
-                return pd.DataFrame()
-            header, *rows = reader
-            return pd.DataFrame(rows, columns=header)
-        except Exception:
-            return pd.DataFrame()
-
-    def find_price_in_folder(folder: Path):
-        """Search all CSVs in a folder for the target item; return (price_float, source_file) or (None, None)."""
-        for csv_file in sorted(folder.glob("*.csv")):
-            if "combined" in str(csv_file):
-                continue
-            df = read_csv_any_encoding(csv_file)
-            
+    def find_price_in_folder(files):
+        """Search a folder's CSVs in order for the target item; return (price_float, source_file, weight) or Nones."""
+        for csv_file in files:
+            df = read_csv(csv_file)
             if df.empty:
                 continue
 
@@ -91,15 +91,24 @@ def get_prices(TARGET_BRAND, TARGET_NAME):
         return None, None, None
 
 
+    # Group raw CSVs by day; days are searched concurrently, files within a day in order
+    by_day = {}
+    for d, csv_file in list_raw_csvs(BASE_DIR, START, END):
+        by_day.setdefault(d, []).append(csv_file)
+    days = sorted(by_day)
+
+    with ThreadPoolExecutor(max_workers=DEFAULT_WORKERS) as pool:
+        hits = dict(zip(days, pool.map(find_price_in_folder, (by_day[d] for d in days))))
+
+    # Days only present in the store (raw CSVs are not committed to the repo)
+    stored_days = [
+        d for d in (datetime.strptime(k, "%Y%m%d").date() for k in load_manifest(STORE_DIR)["days"])
+        if START <= d <= END and d not in hits
+    ]
+    hits.update(store_prices(TARGET_BRAND, TARGET_NAME, STORE_DIR, stored_days))
+
     rows = []
-    for sub in sorted(BASE_DIR.iterdir(), key=lambda p: p.name):
-        if not sub.is_dir():
-            continue
-        d = parse_date_folder(sub.name)
-        if d is None or d < START or d > END:
-            continue
-
-        price, src, weight = find_price_in_folder(sub)
+    for d, (price, src, weight) in sorted(hits.items()):
         rows.append({
             "date": d.strftime("%Y-%m-%d"),
             "price": price,
@@ -108,4 +117,4 @@ def get_prices(TARGET_BRAND, TARGET_NAME):
         })
 
     out = pd.DataFrame(rows).sort_values("date")
-    return out
\ No newline at end of file
+    return out
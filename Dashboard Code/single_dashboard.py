@@ -1,8 +1,15 @@
-from get_prices import get_prices
+from get_prices import HISTORY_START, get_prices
 import streamlit as st
-from datetime import timedelta, date
 import pandas as pd
-import plotly.express as px
+import plotly.io as pio
+from chart_data import build_price_figure
+from dashboard_data import STORE_DIR, data_version
+from history_arrays import open_history
+from windows import DEFAULT_WINDOW_DAYS, ProductWindows, day_numbers
+
+# Averages shown next to the current price; AVG_WINDOW is the headline one
+AVG_WINDOWS = (7, 30, 90)
+AVG_WINDOW = DEFAULT_WINDOW_DAYS
 
 # --- Page + styling (applies the "card" look)
 st.set_page_config(layout="wide")
@@ -46,20 +53,51 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
-def make_dashboard(brand,name):
-    brand = brand.replace("(no brand)", '')
-    prices = get_prices(brand, name)
-    #st.write(prices)
-
-    START_FALLBACK = date(2025, 10, 9)
+@st.cache_data(show_spinner=False)
+def cached_prices(brand, name, version):
+    # get_prices scans every day folder; reruns for the same product reuse the
+    # result until a new day of data lands (version changes)
+    prices = get_prices(brand, name).copy()
 
     # Ensure proper types
-    prices = prices.copy()
     prices["date"] = pd.to_datetime(prices["date"]).dt.date
     prices = prices.dropna(subset=["price"])
+    return prices
+
+
+def product_prices(brand, name, version):
+    """
+    One product's history. With a store, it's a slice of the memory-mapped
+    history arrays shared by every session and process (see history_arrays.py).
+    Without one, it falls back to the cached CSV scan.
+    """
+    history = open_history(STORE_DIR)
+    if history is not None:
+        pid = history.product_id(brand, name)
+        if pid is not None:
+            # Same date range as get_prices; the arrays also hold the days before it
+            return history.frame(pid, start=HISTORY_START)
+    return cached_prices(brand, name, version)
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def cached_figure_json(brand, name, version):
+    """Serialized plotly figure for one product, built from step-collapsed points."""
+    hist = product_prices(brand, name, version).sort_values("date")
+    return build_price_figure(hist).to_json()
+
+
+def make_dashboard(brand,name):
+    brand = brand.replace("(no brand)", '')
+    version = data_version()
+    prices = product_prices(brand, name, version)
+    #st.write(prices)
+
+    START_FALLBACK = HISTORY_START
 
     if prices.empty:
         st.warning("No valid prices to show.")
+        return
     else:
         hist = prices.sort_values("date")
         cur_row = hist.iloc[-1]
@@ -67,9 +105,11 @@ def make_dashboard(brand,name):
         cur_price = float(cur_row["price"])
         cur_weight = cur_row['weight']
 
-        window_start = cur_date - timedelta(days=30)
-        last_month = hist[(hist["date"] > window_start) & (hist["date"] <= cur_date)]
-        avg_30 = float(last_month["price"].mean()) if not last_month.empty else None
+        # Every window length in one pass over the history
+        windows = ProductWindows(AVG_WINDOWS)
+        for day, price in zip(day_numbers(hist["date"]).tolist(), hist["price"].tolist()):
+            windows.push(day, price)
+        avg = windows[AVG_WINDOW].mean()
 
         max_price = float(hist["price"].max())
         min_price = float(hist["price"].min())
@@ -116,9 +156,9 @@ def make_dashboard(brand,name):
         """
 
 
-        if avg_30 is not None and avg_30 != 0:
-            diff_pct = (cur_price - avg_30) / avg_30 * 100
-            down = cur_price < avg_30
+        if avg is not None and avg != 0:
+            diff_pct = (cur_price - avg) / avg * 100
+            down = cur_price < avg
             emoji = "⬇️" if down else ("⬆️" if diff_pct > 0.03 else "➖")
             color = "#16a34a" if down else ("#dc2626" if diff_pct > 0.03 else "#6b7280")
             html += f"""
@@ -126,11 +166,15 @@ def make_dashboard(brand,name):
         {emoji}{diff_pct:+.1f}%
         </span>
         <span class="note" style="margin-left:6px; font-size:30px;">
-        vs 30-day avg (${avg_30:,.2f})
+        vs {AVG_WINDOW}-day avg (${avg:,.2f})
         </span>
             """
+            others = " · ".join(
+                f"{days}-day avg ${windows[days].mean():,.2f}" for days in AVG_WINDOWS if days != AVG_WINDOW
+            )
+            html += f"<div class='note' style='margin-top:6px;'>{others}</div>"
         else:
-            html += """<span style='font-size:18px; margin-left:8px;'>Not enough data for 30-day average.</span>"""
+            html += f"""<span style='font-size:18px; margin-left:8px;'>Not enough data for {AVG_WINDOW}-day average.</span>"""
 
         html += "</h2>"
 
@@ -145,31 +189,6 @@ def make_dashboard(brand,name):
 
     st.header("Price Plot")
 
-    hist_plot = hist.copy()
-    hist_plot["date"] = pd.to_datetime(hist_plot["date"])
-    hist_plot["price"] = pd.to_numeric(hist_plot["price"])
-
-    fig = px.line(
-        hist_plot,
-        x="date",
-        y="price",
-        labels={"date": "Date", "price": "Price ($)"},
-    )
-
-    fig.update_traces(
-        hovertemplate="<b>%{x|%b %d, %Y}</b><br>Price: %{y:$,.2f}<extra></extra>",
-        mode="lines+markers",
-        marker=dict(size=8, line=dict(width=1.5, color="white")),
-        line=dict(width=4),
-    )
-
-    fig.update_layout(
-        height=400,
-        margin=dict(l=20, r=20, t=20, b=20),
-        font=dict(size=20),
-        hoverlabel=dict(font_size=18),
-        xaxis=dict(title_font=dict(size=22), tickfont=dict(size=18)),
-        yaxis=dict(title_font=dict(size=22), tickfont=dict(size=18), tickprefix="$"),
-    )
+    fig = pio.from_json(cached_figure_json(brand, name, version))
 
     st.plotly_chart(fig, use_container_width=True)
@@ -3,12 +3,15 @@ import os
 import datetime
 import re
 import pandas as pd
-from headless import create_undetected_headless_driver
+from headless import launch_browser, new_store_context
+from checkpoint import CategoryCheckpoint
+from instrumentation import count, stage
 
 
 from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 import asyncio
 import itertools
+import time
 
 
 
@@ -31,76 +34,325 @@ def cleanAvg(weight_str: str) -> str:
     return weight_str
 
 
-async def scrape_aldi_data(directory: str):
+CATEGORIES = [
+    'fresh-produce/k/13','healthy-living/k/208','fresh-meat-seafood/k/12','snacks/k/20',
+    'bbq-picnic/k/234','frozen-foods/k/14','dairy-eggs/k/10','beverages/k/7',
+    'pantry-essentials/k/16','deli/k/11','bakery-bread/k/6','breakfast-cereals/k/9'
+]
+
+# Stores to scrape, keyed by region name. "default" is whatever store aldi.us
+# serves with no store selected and is written straight into the day folder;
+# every other region is written to <day>/<region>/. Add regions as e.g.
+#   "chicago": {"zip": "60601"}
+REGIONS = {
+    "default": {},
+}
+DEFAULT_REGION = "default"
+
+# Category pages open at once across all regions (one browser, many contexts)
+MAX_CONCURRENCY = 3
+
+TILE_SELECTOR = '.product-teaser-item.product-grid__item'
+
+# Pagination signals on category pages. Any of them may be missing; then the
+# scraper falls back to the old "wait for tiles, retry, give up" detection.
+# The selectors have not been checked against the live site yet, so by default
+# none of them can end a category: every category ends on the timeout path,
+# and the signals are only read and compared with the tiles actually scraped.
+# Each run logs, per category, signal_agree_<signal> / signal_mismatch_<signal>
+# and signal_savings_s (seconds of the final page a trusted signal would have
+# skipped). Set TRUST_PAGE_SIGNALS once the logs show no mismatches.
+TRUST_PAGE_SIGNALS = False
+TOTAL_COUNT_SELECTOR = '[data-test="product-count"], .product-listing-viewer__product-count, .product-count'
+NEXT_PAGE_SELECTOR = 'a[rel="next"], [data-test="pagination-next"], .base-pagination__arrow--next'
+PAGINATION_SELECTOR = '[data-test="pagination"], .base-pagination, nav[aria-label*="agination"]'
+EMPTY_GRID_SELECTOR = '[data-test="no-results"], .product-listing__no-results, .product-grid--empty'
+
+# Store picker on aldi.us; adjust here if the site markup changes
+STORE_PICKER_BUTTON = '[data-test="store-selector"], button:has-text("Select a store"), button:has-text("Change store")'
+STORE_ZIP_INPUT = 'input[name="zipcode"], input[placeholder*="ZIP"], input[placeholder*="zip"]'
+STORE_RESULT_BUTTON = '[data-test="store-list"] button:has-text("Shop this store"), button:has-text("Shop this store"), button:has-text("Select")'
+
+
+class StoreSelectionError(RuntimeError):
+    """The store for a region could not be selected; its data would be mislabeled."""
+
+
+async def select_store(context, region: str, config: dict):
     """
-    Scrape Aldi categories, enrich with nutrition, and save CSVs.
+    Pick the store for a region in this browser context by searching its ZIP
+    in the site's store picker. Regions without a ZIP use the site default.
     """
-    categories = [
-        'fresh-produce/k/13','healthy-living/k/208','fresh-meat-seafood/k/12','snacks/k/20',
-        'bbq-picnic/k/234','frozen-foods/k/14','dairy-eggs/k/10','beverages/k/7',
-        'pantry-essentials/k/16','deli/k/11','bakery-bread/k/6','breakfast-cereals/k/9'
-    ]
+    zip_code = config.get("zip")
+    if not zip_code:
+        return
+    page = await context.new_page()
+    try:
+        await page.goto("https://aldi.us/", timeout=30000)
+        await page.wait_for_load_state("domcontentloaded")
+        await page.click(STORE_PICKER_BUTTON, timeout=15000)
+        await page.fill(STORE_ZIP_INPUT, zip_code, timeout=15000)
+        await page.keyboard.press("Enter")
+        await page.locator(STORE_RESULT_BUTTON).first.click(timeout=15000)
+        await page.wait_for_load_state("domcontentloaded")
+    except PlaywrightTimeoutError as e:
+        raise StoreSelectionError(f"Could not select a store for {region} (ZIP {zip_code})") from e
+    finally:
+        await page.close()
 
-    stamp = datetime.datetime.now().strftime("%Y%m%d")
-    out_dir = os.path.join(directory, stamp)
-    os.makedirs(out_dir, exist_ok=True)
 
-    pw, browser, context, page = await create_undetected_headless_driver()
+def parse_total_count(text: str):
+    """
+    Category total from a count label: "312 items/products/results", else
+    the N of "Showing 1-60 of 312", else the only number in the label.
+    None when the label is ambiguous.
+    """
+    for pattern in (r"(\d[\d,]*)\s*(?:items|products|results)\b", r"\bof\s+(\d[\d,]*)"):
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            return int(match.group(1).replace(",", ""))
+    numbers = re.findall(r"\d[\d,]*", text)
+    return int(numbers[0].replace(",", "")) if len(numbers) == 1 else None
+
+
+async def read_total_count(page):
+    """Total products in the category as shown on the page, or None if not shown."""
+    el = await page.query_selector(TOTAL_COUNT_SELECTOR)
+    if el is None:
+        return None
+    return parse_total_count(await el.inner_text())
+
+
+async def has_next_page(page):
+    """
+    True/False if the page has pagination controls saying whether a next page
+    exists; None if there are no pagination controls to go by.
+    """
+    nxt = await page.query_selector(NEXT_PAGE_SELECTOR)
+    if nxt is None:
+        # Pagination present but no "next" => last page; no pagination => unknown
+        return False if await page.query_selector(PAGINATION_SELECTOR) else None
+    disabled = await nxt.get_attribute("disabled") is not None \
+        or await nxt.get_attribute("aria-disabled") == "true" \
+        or "disabled" in (await nxt.get_attribute("class") or "")
+    return not disabled
+
+
+async def scrape_category(page, cat: str, region: str = DEFAULT_REGION, checkpoint: CategoryCheckpoint = None) -> pd.DataFrame:
+    """
+    Walk every page of one category and return its tiles as a DataFrame.
+
+    With a checkpoint, each finished page is saved to disk as it's scraped
+    and the walk resumes after the last saved page.
+
+    The walk ends when the page after the last one times out without tiles
+    (after one reload). With TRUST_PAGE_SIGNALS it also ends on an explicit
+    empty grid, or once the shown total is collected. That total is only
+    believed if it is at least the first page's tile count. A missing
+    next-page link is never taken alone: it only skips the reload retry on
+    the following page, and an empty page there confirms it.
 
-    for cat in categories:
-        print("Scraping", cat)
+    exit_<how> counts the exit actually taken. Signals that agree with the
+    tiles count signal_agree_<signal>, plus the seconds trusting them would
+    have saved (signal_savings_s); signals that disagree count
+    signal_mismatch_<signal> and are printed.
+    """
+    cat_name = cat.split('/')[0]
+    start_page, saved = (1, None) if checkpoint is None else checkpoint.load()
+    if saved and saved["name"]:
+        print(f" ↻ resuming {region} {cat_name} at page {start_page} ({len(saved['name'])} rows saved)")
+        brands, names, weights, prices = saved["brand"], saved["name"], saved["weight"], saved["price"]
+    else:
         brands, names, weights, prices = [], [], [], []
+    total = None
+    first_page_tiles = None
+    no_next_at = None  # page whose pagination said there was no next page
+    total_at = None    # page after which the shown total was collected
+
+    def disagree(signal: str, detail: str):
+        count(f"signal_mismatch_{signal}")
+        print(f" ! {region} {cat_name}: {signal} signal disagrees with the tiles ({detail})")
+
+    def agree(last_page: int, page_s: float, retry_s: float):
+        """The category just ended after last_page; credit the signals that said so."""
+        if total_at == last_page:
+            count("signal_agree_total_count")
+            # A trusted total ends the walk before this page is loaded at all
+            count("signal_savings_s", round(page_s, 1))
+        elif no_next_at == last_page:
+            count("signal_agree_no_next_page")
+            # A trusted missing next link skips the reload retry
+            count("signal_savings_s", round(retry_s, 1))
 
+    # An unverified empty-grid marker must not end a category, so it is only waited for when trusted
+    wait_for = f"{TILE_SELECTOR}, {EMPTY_GRID_SELECTOR}" if TRUST_PAGE_SIGNALS else TILE_SELECTOR
 
-        for p in itertools.count(1):
-            url = f"https://aldi.us/products/{cat}?page={p}"
+    for p in itertools.count(start_page):
+        url = f"https://aldi.us/products/{cat}?page={p}"
+        started = time.monotonic()
+        with stage("scrape.page_load", region=region, category=cat_name, page=p):
             await page.goto(url, timeout=30000)
             await page.wait_for_load_state("domcontentloaded")
 
-            # try to see product tiles; if they don't show, retry once, then quit this category
             try:
-                await page.wait_for_selector('.product-teaser-item.product-grid__item', timeout=15000)
+                await page.wait_for_selector(wait_for, timeout=15000)
             except PlaywrightTimeoutError:
+                count("tile_timeouts")
+                if TRUST_PAGE_SIGNALS and no_next_at == p - 1:
+                    # The previous page said it was the last one; this page confirms it
+                    count("exit_no_next_page")
+                    break
+                # No signal at all: retry once, then quit this category
+                retry_started = time.monotonic()
                 await asyncio.sleep(2)
                 await page.reload()
                 await page.wait_for_load_state("domcontentloaded")
                 try:
-                    await page.wait_for_selector('.product-teaser-item.product-grid__item', timeout=15000)
+                    await page.wait_for_selector(TILE_SELECTOR, timeout=15000)
                 except PlaywrightTimeoutError:
                     # no products for this page => end the loop for this category
+                    count("tile_timeouts")
+                    count("exit_timeout")
+                    now = time.monotonic()
+                    agree(p - 1, now - started, now - retry_started)
                     break
 
-            items = await page.query_selector_all('.product-teaser-item.product-grid__item')
-            if not items:
-                # empty page => done with this category
+        items = await page.query_selector_all(TILE_SELECTOR)
+        if not items:
+            # empty page (an explicit empty grid when trusted) => done with this category
+            count("exit_empty_grid" if TRUST_PAGE_SIGNALS else "exit_empty_page")
+            agree(p - 1, time.monotonic() - started, 0.0)
+            break
+        if total_at is not None:
+            disagree("total_count", f"total {total} was reached on page {total_at}, page {p} has {len(items)} tiles")
+            total = total_at = None  # counted once; the label is wrong for this category
+        if no_next_at is not None:
+            disagree("no_next_page", f"page {no_next_at} had no next link, page {p} has {len(items)} tiles")
+            no_next_at = None
+        count("pages")
+        count("tiles", len(items))
+
+        page_start = len(names)
+        for itm in items:
+            b = await itm.query_selector('.product-tile__brandname p')
+            n = await itm.query_selector('.product-tile__name p')
+            w = await itm.query_selector('[data-test="product-tile__unit-of-measurement"] p')
+            pr = await itm.query_selector('span.product-tile__price')
+
+            brands.append((await b.inner_text()).strip().upper() if b else "")
+            names.append((await n.inner_text()).strip() if n else "")
+            cur_weight = cleanAvg((await w.inner_text()).strip() if w else "")
+            weights.append(cur_weight)
+            prices.append((await pr.inner_text()).strip() if pr else "")
+
+        if checkpoint is not None:
+            checkpoint.save_page(p, list(zip(
+                brands[page_start:], names[page_start:], weights[page_start:], prices[page_start:])))
+
+        # What the page itself says about further pages
+        if first_page_tiles is None:
+            first_page_tiles = len(items)
+            shown = await read_total_count(page)
+            if shown is not None and shown < first_page_tiles:
+                # A count below what one page already holds is some other number on the page
+                disagree("total_count", f"label says {shown}, page {p} has {first_page_tiles} tiles")
+            else:
+                total = shown
+        if total is not None and len(names) >= total:
+            if TRUST_PAGE_SIGNALS:
+                count("exit_total_count")
                 break
+            total_at = p
+        if await has_next_page(page) is False:
+            no_next_at = p
+
+    if total is not None and len(names) != total:
+        disagree("total_count", f"label says {total}, scraped {len(names)}")
+
+    return pd.DataFrame({
+        "brand": brands,
+        "name": names,
+        "weight": weights,
+        "price": prices
+    })
+
+
+def region_dir(out_dir: str, region: str) -> str:
+    """Default region writes into the day folder itself; others into a subfolder."""
+    return out_dir if region == DEFAULT_REGION else os.path.join(out_dir, region)
 
-            for itm in items:
-                b = await itm.query_selector('.product-tile__brandname p')
-                n = await itm.query_selector('.product-tile__name p')
-                w = await itm.query_selector('[data-test="product-tile__unit-of-measurement"] p')
-                pr = await itm.query_selector('span.product-tile__price')
 
-                brands.append((await b.inner_text()).strip().upper() if b else "")
-                names.append((await n.inner_text()).strip() if n else "")
-                cur_weight = cleanAvg((await w.inner_text()).strip() if w else "")
-                weights.append(cur_weight)
-                prices.append((await pr.inner_text()).strip() if pr else "")
+async def scrape_aldi_data(directory: str, regions: dict = None, max_concurrency: int = MAX_CONCURRENCY, resume: bool = True,
+                           finished: asyncio.Queue = None):
+    """
+    Scrape Aldi categories for every region and save one CSV per category.
+
+    All regions share one browser process; each region gets its own isolated
+    context (and so its own selected store). Category pages from every region
+    run concurrently, capped at max_concurrency open pages overall.
+
+    Pages are checkpointed as they're scraped. With resume, a rerun on the
+    same day skips categories whose CSV is already final and continues
+    unfinished ones from their last saved page; resume=False starts over.
+
+    With a finished queue, (region, csv_path) is put on it as soon as each
+    category's CSV is final (skipped categories included), so downstream
+    stages can start on it while the rest is still being scraped.
+    """
+    regions = REGIONS if regions is None else regions
+
+    stamp = datetime.datetime.now().strftime("%Y%m%d")
+    out_dir = os.path.join(directory, stamp)
+    os.makedirs(out_dir, exist_ok=True)
 
+    pw, browser = await launch_browser()
+    limit = asyncio.Semaphore(max_concurrency)
 
-        df = pd.DataFrame({
-            "brand": brands,
-            "name": names,
-            "weight": weights,
-            "price": prices
-        })
+    async def run_category(context, region, cat):
+        cat_name = cat.split('/')[0]
+        folder = region_dir(out_dir, region)
+        checkpoint = CategoryCheckpoint(folder, cat_name)
+        if not resume:
+            checkpoint.state_path.unlink(missing_ok=True)
+        elif checkpoint.is_complete():
+            print(f" ✓ {region} {cat_name} already saved, skipping")
+            count("categories_skipped")
+            if finished is not None:
+                await finished.put((region, checkpoint.final_path))
+            return
 
-        # df = await addNutrition_async(df)    # <-- await here
-        path = os.path.join(out_dir, f"{cat.split('/')[0]}.csv")
+        async with limit:
+            print("Scraping", region, cat)
+            with stage("scrape.category", region=region, category=cat_name):
+                page = await context.new_page()
+                try:
+                    df = await scrape_category(page, cat, region, checkpoint)
+                finally:
+                    await page.close()
+
+                # df = await addNutrition_async(df)    # <-- await here
+                checkpoint.finish(df)
+                count("rows", len(df))
+                print(f" → saved {len(df)} rows to {checkpoint.final_path}")
+            if finished is not None:
+                await finished.put((region, checkpoint.final_path))
 
-        df.to_csv(path, index=False)
-        print(f" → saved {len(df)} rows to {path}")
+    async def run_region(region, config):
+        context = await new_store_context(browser)
+        try:
+            try:
+                await select_store(context, region, config)
+            except StoreSelectionError as e:
+                # Skip the region rather than save the default store's prices under its name
+                print(e)
+                return
+            await asyncio.gather(*(run_category(context, region, cat) for cat in CATEGORIES))
+        finally:
+            await context.close()
 
-    await browser.close()
-    await pw.stop()
+    try:
+        await asyncio.gather(*(run_region(r, cfg) for r, cfg in regions.items()))
+    finally:
+        await browser.close()
+        await pw.stop()
     print("All done.")
@@ -0,0 +1,76 @@
+# csv_reader_benchmark.py
+"""
+Throughput of the raw-CSV readers over the data/ tree.
+
+Compares the old per-file reader (pd.read_csv retried per encoding, one file
+at a time) with csv_reader.read_many at several thread counts and engines.
+
+Usage:
+    python benchmarks/csv_reader_benchmark.py [--data data] [--runs 3] [--workers 1 4 8]
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+import csv_reader
+from csv_reader import list_raw_csvs, read_many
+
+
+def legacy_read(path: Path) -> pd.DataFrame:
+    """The reader get_prices used before csv_reader existed."""
+    for enc in ("utf-8", "utf-8-sig", "cp1252"):
+        try:
+            return pd.read_csv(path, encoding=enc)
+        except Exception:
+            continue
+    return pd.DataFrame()
+
+
+def bench(label, fn, paths, total_bytes, runs):
+    times, rows = [], 0
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        frames = fn(paths)
+        times.append(time.perf_counter() - t0)
+        rows = sum(len(f) for f in frames)
+    t = statistics.median(times)
+    print(f"{label:<28}{t * 1000:>9.1f} ms{len(paths) / t:>10.0f} files/s"
+          f"{rows / t:>12.0f} rows/s{total_bytes / t / 1e6:>8.1f} MB/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=str(ROOT / "data"))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    paths = [p for _, p in list_raw_csvs(args.data)]
+    total_bytes = sum(p.stat().st_size for p in paths)
+    print(f"{len(paths)} files, {total_bytes / 1e6:.1f} MB\n")
+
+    bench("legacy sequential", lambda ps: [legacy_read(p) for p in ps], paths, total_bytes, args.runs)
+
+    engines = ["c"]
+    try:
+        import pyarrow  # noqa: F401
+        engines.append("pyarrow")
+    except ImportError:
+        pass
+
+    for engine in engines:
+        for w in args.workers:
+            # Start each configuration with no recorded encodings
+            csv_reader._encoding_cache.clear()
+            bench(f"read_many {engine} x{w}", lambda ps: read_many(ps, max_workers=w, engine=engine),
+                  paths, total_bytes, args.runs)
+
+
+if __name__ == "__main__":
+    main()
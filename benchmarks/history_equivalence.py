@@ -0,0 +1,78 @@
+# history_equivalence.py
+"""
+Check that the dashboard's memory-mapped histories match get_prices.
+
+For a sample of products, compare history_arrays (as product_prices reads
+them, starting at HISTORY_START) with the get_prices scan over data/ and
+the store. The sample always includes products that have rows before
+HISTORY_START, since the arrays hold those days and must leave them out.
+Missing weights are compared as "" (the arrays store them that way).
+Exits with status 1 on any mismatch.
+
+Usage:
+    python benchmarks/history_equivalence.py [--sample 40] [--data data] [--store store]
+"""
+import argparse
+import random
+import sys
+from datetime import timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "Dashboard Code"))
+
+from compact_data import load_prices, load_products
+from history_arrays import open_history
+from get_prices import HISTORY_START, get_prices
+
+
+def _rows(df):
+    return [
+        (str(d), round(float(p), 2), "" if w is None or w != w else str(w))
+        for d, p, w in zip(df["date"], df["price"], df["weight"])
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sample", type=int, default=40, help="products to compare (half from before HISTORY_START)")
+    parser.add_argument("--data", default=str(ROOT / "data"))
+    parser.add_argument("--store", default=str(ROOT / "store"))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    store = Path(args.store)
+    history = open_history(store)
+    if history is None:
+        sys.exit(f"No store at {store}")
+    products = load_products(store)
+    early = set(load_prices(store, end=HISTORY_START - timedelta(days=1), region="default")["product_id"])
+
+    rng = random.Random(args.seed)
+    ids = products["product_id"].tolist()
+    early_ids = sorted(early)
+    picks = rng.sample(early_ids, min(len(early_ids), args.sample // 2))
+    picks += rng.sample([i for i in ids if i not in early], min(len(ids) - len(early), args.sample - len(picks)))
+
+    by_id = products.set_index("product_id")
+    failures = dropped = 0
+    for pid in picks:
+        brand, name = by_id.at[pid, "brand"], by_id.at[pid, "name"]
+        brand = "" if brand != brand else brand
+        canonical = history.product_id(brand, name)
+        arrays = history.frame(canonical, start=HISTORY_START)
+        dropped += len(history.frame(canonical)) - len(arrays)
+
+        scanned = get_prices(brand, name, base_dir=args.data, store_dir=store).dropna(subset=["price"])
+        if _rows(arrays) != _rows(scanned):
+            failures += 1
+            print(f"MISMATCH {brand!r} {name!r}: arrays {len(arrays)} rows, get_prices {len(scanned)} rows")
+
+    print(f"Compared {len(picks)} products ({len(set(picks) & early)} with rows before {HISTORY_START}); "
+          f"{dropped} pre-START rows left out; {failures} mismatches.")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# interaction_benchmark.py
+"""
+Compare per-interaction latency of a full-script rerun vs. a fragment rerun.
+
+Without fragments every widget interaction reruns all of all_dashboard.py.
+With them only the panel that owns the widget reruns. AppTest always executes
+the whole script, so the fragment case is measured by running just the
+fragment body (search_panel or movers_panel) with the same session state,
+which is exactly what Streamlit executes on a fragment rerun.
+
+Needs a day folder (today or yesterday) with combined_* and price_anomalies_*
+CSVs, the same as the app.
+
+Usage:
+    python benchmarks/interaction_benchmark.py [--runs 5] [--query "kettle chips"]
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from streamlit.testing.v1 import AppTest
+
+DASHBOARD_DIR = Path(__file__).resolve().parents[1] / "Dashboard Code"
+sys.path.insert(0, str(DASHBOARD_DIR))
+sys.path.insert(0, str(DASHBOARD_DIR.parent))
+APP = str(DASHBOARD_DIR / "all_dashboard.py")
+
+
+def search_fragment(combined_path):
+    from dashboard_panels import search_panel
+    search_panel(combined_path)
+
+
+def movers_fragment(anomalies_path):
+    from dashboard_panels import movers_panel
+    movers_panel(anomalies_path)
+
+
+def timed_run(at: AppTest, runs: int):
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        at.run()
+        times.append(time.perf_counter() - t0)
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+    return statistics.median(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--query", default="kettle chips")
+    args = parser.parse_args()
+
+    from dashboard_data import find_csv_with_prefix
+    from dashboard_panels import cached_movers
+    import os
+    from datetime import date, timedelta
+
+    folder = None
+    for d in (date.today(), date.today() - timedelta(days=1)):
+        candidate = DASHBOARD_DIR.parent / "data" / d.strftime("%Y%m%d")
+        if candidate.is_dir():
+            folder = candidate
+            break
+    combined_path = find_csv_with_prefix(folder, "combined") if folder else None
+    anomalies_path = find_csv_with_prefix(folder, "price_anomalies") if folder else None
+    if combined_path is None or anomalies_path is None:
+        raise SystemExit("Need combined_* and price_anomalies_* CSVs in today's or yesterday's data folder.")
+
+    deals, _ = cached_movers(anomalies_path, os.path.getmtime(anomalies_path))
+    card = deals.iloc[0] if not deals.empty else None
+
+    full = AppTest.from_file(APP, default_timeout=120)
+    search = AppTest.from_function(search_fragment, args=(combined_path,), default_timeout=120)
+    movers = AppTest.from_function(movers_fragment, args=(anomalies_path,), default_timeout=120)
+
+    rows = []
+
+    # Typing a search query
+    for at in (full, search):
+        at.session_state["search_query"] = args.query
+        at.run()  # warm caches
+    rows.append(("search query", timed_run(full, args.runs), timed_run(search, args.runs)))
+
+    # Picking a product from the search results
+    options = search.selectbox(key="product_select").options
+    if len(options) > 1:
+        for at in (full, search):
+            at.session_state["product_select"] = options[1]
+            at.run()
+        rows.append(("pick product", timed_run(full, args.runs), timed_run(search, args.runs)))
+
+    # Clicking a price-mover card
+    if card is not None:
+        for at in (full, movers):
+            at.session_state["selected_brand"] = card["brand"]
+            at.session_state["selected_name"] = card["name"]
+            at.run()
+        rows.append(("card click", timed_run(full, args.runs), timed_run(movers, args.runs)))
+
+    print(f"{'interaction':<14}{'full rerun':>14}{'fragment':>14}{'speedup':>10}")
+    for label, full_ms, frag_ms in rows:
+        print(f"{label:<14}{full_ms:>11.1f} ms{frag_ms:>11.1f} ms{full_ms / frag_ms:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
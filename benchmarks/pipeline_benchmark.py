@@ -0,0 +1,123 @@
+# pipeline_benchmark.py
+"""
+Time each analytics stage on synthetic catalogs at several scales.
+
+For every scale the synthetic generator writes <products * scale> products
+x <days> into a temp data/ tree, then these stages run against it:
+
+    concat      concat_data()              last 30 days -> combined CSV
+    anomalies   get_anomalies()            score every product's latest price
+    compact     compact_data.compact()     whole tree -> store/
+    get_prices  get_prices() x --lookups   per-product history scans
+    search      build_products + search_products x --queries
+
+Durations and memory come from the instrumentation run log: max RSS always,
+plus the per-stage tracemalloc peak with --trace-memory (much slower).
+Throughput is raw rows (products x days in range) per second.
+
+Usage:
+    python benchmarks/pipeline_benchmark.py [--scales 1 10] [--products 3000] [--days 60]
+        [--change-rate 0.02] [--anomaly-rate 0.01] [--lookups 20] [--queries 50] [--trace-memory] [--keep DIR]
+"""
+import argparse
+import contextlib
+import io
+import json
+import sys
+import tempfile
+from pathlib import Path
+from datetime import date
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "Dashboard Code"))
+
+from synthetic_data import generate
+from instrumentation import finish_run, stage, start_run, count
+from concat_data import concat_data, get_anomalies
+from compact_data import compact
+from get_prices import get_prices
+from dashboard_data import build_products, load_combined, search_products
+
+END = date(2025, 12, 6)
+
+
+def run_scale(work: Path, products: int, args):
+    data_dir = work / "data"
+    catalog, injected = generate(data_dir, products, args.days, args.change_rate,
+                                 args.anomaly_rate, END, seed=0)
+    rng = np.random.default_rng(1)
+    window_rows = products * min(args.days, 31)
+    total_rows = products * args.days
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        run = start_run(work / "logs", run_id=f"{products}", trace_memory=args.trace_memory)
+        with stage("concat"):
+            combined_path = concat_data(str(data_dir), END)
+            count("rows", window_rows)
+
+        with stage("anomalies"):
+            found = get_anomalies(str(data_dir), END)
+            count("rows", window_rows)
+
+        with stage("compact"):
+            compact(data_dir, work / "store", full=True)
+            count("rows", total_rows)
+
+        picks = catalog.iloc[rng.choice(len(catalog), args.lookups, replace=False)]
+        with stage("get_prices"):
+            for brand, name in zip(picks["brand"], picks["name"]):
+                get_prices(brand, name, base_dir=data_dir, start=date(2000, 1, 1), end=END)
+            count("rows", total_rows * args.lookups)
+
+        with stage("search"):
+            products_df = build_products(load_combined(combined_path))
+            words = catalog["name"].str.split().str[:2].str.join(" ")
+            for q in words.sample(args.queries, random_state=1):
+                search_products(products_df, q)
+            count("rows", len(products_df) * args.queries)
+        finish_run()
+
+    found_keys = set(zip(found["brand"].replace("(no brand)", ""), found["name"])) if len(found) else set()
+    recall = np.mean([(b, n) in found_keys for b, n in zip(injected["brand"], injected["name"])]) if len(injected) else float("nan")
+    return _top_level_stages(run.path), recall
+
+
+def _top_level_stages(path):
+    """Top-level stage records from a run log (nested stages are left out)."""
+    with open(path, "r", encoding="utf-8") as f:
+        recs = [json.loads(line) for line in f]
+    return [r for r in recs if r.get("event") == "stage" and r["parent"] is None]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--products", type=int, default=3000, help="products at scale 1")
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--change-rate", type=float, default=0.02)
+    parser.add_argument("--anomaly-rate", type=float, default=0.01)
+    parser.add_argument("--lookups", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--trace-memory", action="store_true", help="per-stage tracemalloc peaks (slow)")
+    parser.add_argument("--keep", help="write the synthetic trees here instead of a temp dir")
+    args = parser.parse_args()
+
+    print(f"{'scale':>6}{'products':>10}  {'stage':<12}{'seconds':>10}{'rows/s':>14}{'max RSS MB':>12}{'peak MB':>10}")
+    for scale in args.scales:
+        products = args.products * scale
+        with tempfile.TemporaryDirectory() as tmp:
+            work = Path(args.keep) / f"x{scale}" if args.keep else Path(tmp)
+            stages, recall = run_scale(work, products, args)
+        for s in stages:
+            rate = s["counters"].get("rows", 0) / s["duration_s"] if s["duration_s"] else 0
+            rss = f"{s['max_rss_bytes'] / 1e6:12.1f}" if s["max_rss_bytes"] else f"{'-':>12}"
+            peak = f"{s['peak_mem_bytes'] / 1e6:10.1f}" if s["peak_mem_bytes"] is not None else f"{'-':>10}"
+            print(f"{scale:>6}{products:>10}  {s['stage']:<12}{s['duration_s']:>10.2f}{rate:>14,.0f}{rss}{peak}")
+        print(f"{'':>18}injected anomaly recall: {recall:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# query_load_test.py
+"""
+Load-test the query service and report p50/p99 latency per endpoint.
+
+Starts query_service in-process on a free port (or targets --url), then
+--clients threads send --requests requests each, spread over a mix of
+search, history, batch history and anomalies calls for random products.
+The first pass runs against a cold response cache. A second pass
+repeats the same requests, so the warm numbers show cache hits.
+
+Usage:
+    python benchmarks/query_load_test.py [--clients 8] [--requests 200] [--batch 20]
+        [--store store] [--data data] [--url http://127.0.0.1:8765]
+"""
+import argparse
+import http.client
+import json
+import random
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+
+def make_requests(products, n, batch, rng):
+    """n request paths, mixed 40% search / 35% history / 15% batch / 10% anomalies."""
+    words = [w for p in products for w in p["display"].split()[:2] if w.isalpha()]
+    ids = [p["product_id"] for p in products]
+    out = []
+    for _ in range(n):
+        r = rng.random()
+        if r < 0.40:
+            out.append(("search", f"/search?q={quote(' '.join(rng.sample(words, 2)))}"))
+        elif r < 0.75:
+            out.append(("history", f"/history?product_id={rng.choice(ids)}"))
+        elif r < 0.90:
+            out.append(("batch", "/history/batch?ids=" + ",".join(map(str, rng.sample(ids, batch)))))
+        else:
+            out.append(("anomalies", "/anomalies" + rng.choice(["", "?direction=lower", "?direction=higher"])))
+    return out
+
+
+def client(host, port, requests, results):
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    for kind, path in requests:
+        start = time.perf_counter()
+        conn.request("GET", path)
+        resp = conn.getresponse()
+        resp.read()
+        results.append((kind, time.perf_counter() - start, resp.status))
+    conn.close()
+
+
+def run_pass(host, port, per_client):
+    results = []
+    threads = [threading.Thread(target=client, args=(host, port, reqs, results)) for reqs in per_client]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, time.perf_counter() - start
+
+
+def report(label, results, elapsed):
+    print(f"\n{label}: {len(results)} requests in {elapsed:.2f}s ({len(results) / elapsed:,.0f} req/s)")
+    print(f"{'endpoint':<12}{'count':>8}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    kinds = sorted({k for k, _, _ in results}) + ["all"]
+    for kind in kinds:
+        lat = sorted(s * 1000 for k, s, _ in results if kind in ("all", k))
+        errors = sum(1 for k, _, status in results if kind in ("all", k) and status != 200)
+        p99 = lat[min(len(lat) - 1, int(len(lat) * 0.99))]
+        print(f"{kind:<12}{len(lat):>8}{statistics.median(lat):>10.2f}{p99:>10.2f}{errors:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="requests per client per pass")
+    parser.add_argument("--batch", type=int, default=20, help="ids per batch-history request")
+    parser.add_argument("--store", default=str(ROOT / "store"))
+    parser.add_argument("--data", default=str(ROOT / "data"))
+    parser.add_argument("--url", help="test a running service instead of starting one")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        host, port = urlsplit(args.url).hostname, urlsplit(args.url).port
+    else:
+        from query_service import serve
+        start = time.perf_counter()
+        server = serve("127.0.0.1", 0, Path(args.store), Path(args.data))
+        host, port = server.server_address
+        print(f"Index built in {time.perf_counter() - start:.2f}s")
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # Sample products through the service itself
+    conn = http.client.HTTPConnection(host, port)
+    products = []
+    for q in ["chips", "cheese", "chicken", "bread", "juice", "organic", "frozen", "yogurt", "original", "family"]:
+        conn.request("GET", f"/search?q={q}&limit=500")
+        products += json.loads(conn.getresponse().read())["results"]
+    conn.close()
+    if len(products) < args.batch:
+        raise SystemExit("Too few products in the store for the load test.")
+
+    rng = random.Random(args.seed)
+    per_client = [make_requests(products, args.requests, args.batch, rng) for _ in range(args.clients)]
+
+    for label in ("cold cache", "warm cache"):
+        results, elapsed = run_pass(host, port, per_client)
+        report(f"{label}, {args.clients} clients", results, elapsed)
+
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
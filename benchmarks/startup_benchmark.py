@@ -0,0 +1,105 @@
+# startup_benchmark.py
+"""
+Measure how long the Streamlit app takes before its first paint.
+
+Each scenario runs in a fresh interpreter so import costs are counted:
+  legacy  - old critical path: requests + PIL + pandas + plotly imports,
+            network icon fetch, full data load, then first paint
+  fast    - new critical path: cached/fallback icon and light imports only;
+            the data load happens after the header and search box are drawn
+
+Usage:
+    python benchmarks/startup_benchmark.py [--runs 5] [--combined path/to/combined.csv]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+DASHBOARD_DIR = ROOT / "Dashboard Code"
+
+LEGACY = r"""
+import time
+t0 = time.perf_counter()
+import requests
+from io import BytesIO
+from PIL import Image
+import pandas as pd
+import plotly.express as px
+from dashboard_data import ICON_URL, load_combined, build_products
+try:
+    Image.open(BytesIO(requests.get(ICON_URL, timeout=10).content))
+except Exception:
+    pass
+build_products(load_combined(COMBINED))
+print(time.perf_counter() - t0)
+"""
+
+FAST = r"""
+import time
+t0 = time.perf_counter()
+from dashboard_data import get_page_icon, load_combined, build_products
+get_page_icon()
+first_paint = time.perf_counter() - t0
+build_products(load_combined(COMBINED))
+print(first_paint, time.perf_counter() - t0)
+"""
+
+
+def make_combined(out_path: Path, days: int = 30):
+    """Build a combined CSV from the most recent raw day folders (like concat_data)."""
+    import pandas as pd
+
+    folders = sorted(p for p in (ROOT / "data").iterdir() if p.is_dir() and p.name.isdigit())[-days:]
+    frames = []
+    for folder in folders:
+        for csv_path in folder.glob("*.csv"):
+            if "combined" in csv_path.name or "anomalies" in csv_path.name:
+                continue
+            df = pd.read_csv(csv_path)
+            if not {"name", "price"}.issubset(df.columns):
+                continue
+            df = df.reindex(columns=["brand", "name", "weight", "price"])
+            df["date"] = pd.to_datetime(folder.name, format="%Y%m%d").date()
+            frames.append(df)
+    pd.concat(frames, ignore_index=True).to_csv(out_path, index=False)
+
+
+def time_snippet(code: str, combined: str):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([str(DASHBOARD_DIR), str(ROOT)]))
+    out = subprocess.run(
+        [sys.executable, "-c", f"COMBINED = {combined!r}\n" + code],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    return [float(x) for x in out.stdout.split()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--combined", help="combined_*.csv to load (built from data/ if omitted)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        combined = args.combined
+        if combined is None:
+            combined = str(Path(tmp) / "combined.csv")
+            make_combined(Path(combined))
+
+        legacy = [time_snippet(LEGACY, combined)[0] for _ in range(args.runs)]
+        fast = [time_snippet(FAST, combined) for _ in range(args.runs)]
+
+    fast_paint = [f[0] for f in fast]
+    fast_total = [f[1] for f in fast]
+    print(f"runs: {args.runs}")
+    print(f"legacy  first paint (median): {statistics.median(legacy) * 1000:8.1f} ms")
+    print(f"fast    first paint (median): {statistics.median(fast_paint) * 1000:8.1f} ms")
+    print(f"fast    data ready  (median): {statistics.median(fast_total) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# synthetic_data.py
+"""
+Generate a synthetic Aldi catalog in the same layout the scraper writes:
+
+    <out>/YYYYMMDD/<category>.csv   columns brand,name,weight,price ("$2.49")
+
+Prices mostly stay flat: each product changes price on a given day with
+probability --change-rate (a small move around its base price). On the last
+day, --anomaly-rate of products get an injected spike or drop; those are
+listed in <out>/synthetic_anomalies.csv so detection can be checked.
+
+Usage:
+    python benchmarks/synthetic_data.py OUT_DIR [--products 3000] [--days 60]
+        [--change-rate 0.02] [--anomaly-rate 0.01] [--end 2025-12-06] [--seed 0]
+"""
+import argparse
+from pathlib import Path
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+CATEGORIES = [
+    "fresh-produce", "healthy-living", "fresh-meat-seafood", "snacks",
+    "bbq-picnic", "frozen-foods", "dairy-eggs", "beverages",
+    "pantry-essentials", "deli", "bakery-bread", "breakfast-cereals",
+]
+BRANDS = [
+    "CLANCY'S", "BENTON'S", "SIMPLY NATURE", "NATURE'S NECTAR", "HAPPY FARMS",
+    "BREMER", "PARK STREET DELI", "L'OVEN FRESH", "MILLVILLE", "SPECIALLY SELECTED",
+    "", "BURMAN'S", "CHOCEUR", "APPLETON FARMS", "FIT & ACTIVE", "SAVORITZ",
+]
+NOUNS = [
+    "Kettle Chips", "Breakfast Biscuits", "Ground Beef", "Greek Yogurt", "Orange Juice",
+    "Sourdough Bread", "Frozen Pizza", "Cheddar Cheese", "Granola", "Pretzels",
+    "Blueberries", "Chicken Breast", "Pasta Sauce", "Sparkling Water", "Ice Cream",
+]
+ADJECTIVES = [
+    "Original", "Organic", "Honey", "Sea Salt", "Whole Grain", "Spicy", "Classic",
+    "Reduced Fat", "Family Size", "Vanilla", "Garlic", "Mixed Berry",
+]
+SIZES = ["8 oz", "12 oz", "16 oz", "1 lb", "2 lb", "3 lb", "24 oz", "32 fl oz", "6 pack", "12 ct"]
+
+
+def make_catalog(products: int, rng: np.random.Generator) -> pd.DataFrame:
+    """Unique brand/name/weight/category rows with a base price each."""
+    brand = rng.choice(BRANDS, products)
+    adj = rng.choice(ADJECTIVES, products)
+    noun = rng.choice(NOUNS, products)
+    weight = rng.choice(SIZES, products)
+    # The running number keeps names unique at any catalog size
+    name = [f"{a} {n} #{i}, {w}" for i, (a, n, w) in enumerate(zip(adj, noun, weight))]
+    return pd.DataFrame({
+        "brand": brand,
+        "name": name,
+        "weight": weight,
+        "category": rng.choice(CATEGORIES, products),
+        "base_price": np.round(rng.lognormal(1.2, 0.6, products), 2).clip(0.29, 49.99),
+    })
+
+
+def price_matrix(base: np.ndarray, days: int, change_rate: float, rng: np.random.Generator) -> np.ndarray:
+    """products x days price matrix where each product's price is a step function."""
+    changes = rng.random((len(base), days)) < change_rate
+    changes[:, 0] = True
+    levels = base[:, None] * rng.uniform(0.85, 1.15, (len(base), days))
+    # Carry the last change forward: index of the most recent change for each cell
+    idx = np.where(changes, np.arange(days), 0)
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    prices = np.take_along_axis(levels, idx, axis=1)
+    prices[:, 0] = base
+    return np.round(prices, 2)
+
+
+def generate(out_dir, products=3000, days=60, change_rate=0.02, anomaly_rate=0.01,
+             end=date(2025, 12, 6), seed=0):
+    """Write the synthetic tree and return (catalog, injected_anomalies)."""
+    out_dir = Path(out_dir)
+    rng = np.random.default_rng(seed)
+    catalog = make_catalog(products, rng)
+    prices = price_matrix(catalog["base_price"].to_numpy(), days, change_rate, rng)
+
+    # Inject anomalies on the last day
+    n_anom = int(round(products * anomaly_rate))
+    anom_idx = rng.choice(products, n_anom, replace=False)
+    factor = np.where(rng.random(n_anom) < 0.5, 0.5, 1.6)
+    prices[anom_idx, -1] = np.round(prices[anom_idx, -1] * factor, 2)
+
+    start = end - timedelta(days=days - 1)
+    by_cat = catalog.groupby("category").indices
+    for day in range(days):
+        folder = out_dir / (start + timedelta(days=day)).strftime("%Y%m%d")
+        folder.mkdir(parents=True, exist_ok=True)
+        price_str = np.char.add("$", np.char.mod("%.2f", prices[:, day]))
+        for cat, rows in by_cat.items():
+            pd.DataFrame({
+                "brand": catalog["brand"].to_numpy()[rows],
+                "name": np.asarray(catalog["name"])[rows],
+                "weight": catalog["weight"].to_numpy()[rows],
+                "price": price_str[rows],
+            }).to_csv(folder / f"{cat}.csv", index=False)
+
+    injected = catalog.iloc[anom_idx][["brand", "name"]].assign(
+        factor=factor, latest_price=prices[anom_idx, -1]
+    )
+    injected.to_csv(out_dir / "synthetic_anomalies.csv", index=False)
+    return catalog, injected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("out_dir")
+    parser.add_argument("--products", type=int, default=3000)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--change-rate", type=float, default=0.02)
+    parser.add_argument("--anomaly-rate", type=float, default=0.01)
+    parser.add_argument("--end", type=date.fromisoformat, default=date(2025, 12, 6))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    catalog, injected = generate(args.out_dir, args.products, args.days, args.change_rate,
+                                 args.anomaly_rate, args.end, args.seed)
+    print(f"Wrote {len(catalog)} products x {args.days} days to {args.out_dir} "
+          f"({len(injected)} injected anomalies)")
+
+
+if __name__ == "__main__":
+    main()
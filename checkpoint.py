@@ -0,0 +1,92 @@
+# checkpoint.py
+import os
+import csv
+import json
+from pathlib import Path
+import pandas as pd
+
+COLUMNS = ["brand", "name", "weight", "price"]
+
+
+class CategoryCheckpoint:
+    """
+    Page-level progress for one category scrape, kept under <folder>/.partial/.
+
+    Every scraped page is appended to <category>.csv there, then
+    <category>.json records how many pages/rows are complete. After a crash,
+    load() returns the rows of all finished pages and the page to resume
+    from. Rows past the recorded count (a page appended but not yet recorded
+    when the crash hit) are dropped and that page is scraped again.
+    """
+
+    def __init__(self, folder, category: str):
+        self.final_path = Path(folder) / f"{category}.csv"
+        self.dir = Path(folder) / ".partial"
+        self.rows_path = self.dir / f"{category}.csv"
+        self.state_path = self.dir / f"{category}.json"
+        self.pages_done = 0
+        self.rows_done = 0
+
+    def is_complete(self) -> bool:
+        """The final CSV exists and no partial scrape is pending (final files are written atomically)."""
+        return self.final_path.is_file() and not self.state_path.is_file()
+
+    def load(self):
+        """Return (next_page, {column: [values]}) to resume from; page 1 and empty lists if nothing is saved."""
+        rows = {c: [] for c in COLUMNS}
+        try:
+            with self.state_path.open("r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return 1, rows
+
+        self.pages_done = state["pages_done"]
+        self.rows_done = state["rows"]
+        if self.rows_done:
+            # Strings exactly as scraped: no NaN conversion, so the final CSV matches an uninterrupted run
+            try:
+                saved = pd.read_csv(self.rows_path, dtype=str, keep_default_na=False)
+            except (OSError, ValueError):
+                saved = pd.DataFrame(columns=COLUMNS)
+            if len(saved) < self.rows_done:
+                # The rows file lost data: start the category over
+                self.pages_done = self.rows_done = 0
+                return 1, rows
+            if len(saved) > self.rows_done:
+                # Drop rows appended after the last recorded page (a crash mid-save)
+                saved = saved.head(self.rows_done)
+                saved.to_csv(self.rows_path, index=False)
+            rows = {c: saved[c].tolist() for c in COLUMNS}
+        return self.pages_done + 1, rows
+
+    def save_page(self, page_no: int, page_rows):
+        """Append one page of (brand, name, weight, price) rows, then record it as done."""
+        self.dir.mkdir(parents=True, exist_ok=True)
+        mode = "w" if self.pages_done == 0 or not self.rows_path.is_file() else "a"
+        with self.rows_path.open(mode, encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            if mode == "w":
+                writer.writerow(COLUMNS)
+            writer.writerows(page_rows)
+            f.flush()
+            os.fsync(f.fileno())
+
+        self.pages_done = page_no
+        self.rows_done += len(page_rows)
+        tmp = self.state_path.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump({"pages_done": self.pages_done, "rows": self.rows_done}, f)
+        os.replace(tmp, self.state_path)
+
+    def finish(self, df: pd.DataFrame):
+        """Write the final category CSV atomically and remove the partial files."""
+        self.final_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.final_path.with_suffix(".csv.tmp")
+        df.to_csv(tmp, index=False)
+        os.replace(tmp, self.final_path)
+        self.state_path.unlink(missing_ok=True)
+        self.rows_path.unlink(missing_ok=True)
+        try:
+            self.dir.rmdir()
+        except OSError:
+            pass  # other categories still have partial files
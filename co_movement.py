@@ -0,0 +1,189 @@
+# co_movement.py
+"""
+Find same-day repricing events across groups of products: the whole store,
+a category, a brand, or a brand within a category (e.g. all CLANCY'S
+snacks moving on the same day).
+
+Everything is sparse matrix algebra, with no loops over products or product pairs:
+
+    C   products x days   % price change vs the product's previous observed price,
+                          stored only where the price changed (scipy.sparse CSR)
+    O   products x days   1 where the product was listed that day
+    G   groups x products one-hot incidence matrix of a grouping
+
+    G @ (C > 0)   products raising their price, per group and day
+    G @ (C < 0)   products cutting their price, per group and day
+    G @ O         products listed, per group and day
+
+A (group, day, direction) cell is an event when at least MIN_PRODUCTS
+products moved that way and they make up at least the grouping's share
+threshold of the products listed. Only the flagged cells are expanded back
+into member products.
+
+Writes base_dir/<today>/comovement_<today>.csv with one row per event.
+
+Usage:
+    python co_movement.py [--store store] [--data data] [--days 30] [--today YYYY-MM-DD]
+"""
+import os
+import argparse
+from pathlib import Path
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from compact_data import DATA_DIR, STORE_DIR, load_prices, load_products
+from instrumentation import count, stage
+
+MIN_PRODUCTS = 3
+# Share of a group's listed products that must move together, per grouping
+MIN_SHARE = {"store": 0.05, "category": 0.2, "brand": 0.3, "brand_category": 0.5}
+# Days loaded before the window so changes on its first day have a previous price
+LOOKBACK_DAYS = 7
+MAX_EXAMPLES = 5
+MISSING_BRAND = "(no brand)"
+
+EVENT_COLS = [
+    "region", "date", "group_type", "group", "direction", "products_changed",
+    "products_listed", "share_changed", "mean_pct_change", "median_pct_change",
+    "product_ids", "examples",
+]
+
+
+def change_matrices(prices: pd.DataFrame, days: pd.DatetimeIndex, n_products: int):
+    """
+    (C, O) for one region's rows (product_id, date, price). Columns of both
+    follow `days`. Rows dated before days[0] only supply previous prices.
+    """
+    prices = prices.sort_values(["product_id", "date"], kind="mergesort")
+    pid = prices["product_id"].to_numpy(dtype=np.int64)
+    price = prices["price"].to_numpy(dtype=float)
+    col = days.get_indexer(pd.to_datetime(prices["date"]))  # -1 before the window
+
+    same = pid[1:] == pid[:-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct = (price[1:] / price[:-1] - 1.0) * 100.0
+    changed = same & (col[1:] >= 0) & np.isfinite(pct) & (np.abs(pct) > 1e-9)
+    C = sparse.csr_matrix(
+        (pct[changed], (pid[1:][changed], col[1:][changed])), shape=(n_products, len(days))
+    )
+
+    listed = col >= 0
+    O = sparse.csr_matrix(
+        (np.ones(listed.sum()), (pid[listed], col[listed])), shape=(n_products, len(days))
+    )
+    return C, O
+
+
+def incidence(labels: pd.Series, n_products: int):
+    """(G, group names) with G[g, p] = 1 when product p has label g; labels is indexed by product_id."""
+    codes, names = pd.factorize(labels, sort=True)
+    G = sparse.csr_matrix(
+        (np.ones(len(codes)), (codes, labels.index.to_numpy())), shape=(len(names), n_products)
+    )
+    return G, list(names)
+
+
+def groupings(products: pd.DataFrame, n_products: int):
+    """{group_type: (G, names)} for the store, categories, brands and brand x category."""
+    p = products.set_index("product_id")
+    brand = p["brand"].replace("", MISSING_BRAND)
+    return {
+        "store": incidence(pd.Series("all products", index=p.index), n_products),
+        "category": incidence(p["category"], n_products),
+        "brand": incidence(brand, n_products),
+        "brand_category": incidence(brand + " / " + p["category"], n_products),
+    }
+
+
+def find_events(C, O, groups, days, products, region,
+                min_products=MIN_PRODUCTS, min_share=MIN_SHARE) -> pd.DataFrame:
+    """One row per (group, day, direction) where enough of the group moved together."""
+    up = (C > 0).astype(np.float64)
+    down = (C < 0).astype(np.float64)
+    names = products.set_index("product_id")
+    display = (names["brand"] + " " + names["name"]).str.strip()
+
+    rows = []
+    for group_type, (G, group_names) in groups.items():
+        listed = (G @ O).toarray()
+        for direction, moved in (("up", up), ("down", down)):
+            n = (G @ moved).tocoo()
+            share = n.data / np.maximum(listed[n.row, n.col], 1)
+            hit = (n.data >= min_products) & (share >= min_share[group_type])
+            count(f"events_{group_type}", int(hit.sum()))
+
+            for g, d, k, s in zip(n.row[hit], n.col[hit], n.data[hit], share[hit]):
+                # Members: products in group g that moved this direction on day d
+                members = G[g].multiply(moved[:, d].T).tocsr().indices
+                pct = C[members, d].toarray().ravel()
+                rows.append({
+                    "region": region,
+                    "date": days[d].date(),
+                    "group_type": group_type,
+                    "group": group_names[g],
+                    "direction": direction,
+                    "products_changed": int(k),
+                    "products_listed": int(listed[g, d]),
+                    "share_changed": round(float(s), 4),
+                    "mean_pct_change": round(float(pct.mean()), 2),
+                    "median_pct_change": round(float(np.median(pct)), 2),
+                    "product_ids": " ".join(map(str, members)),
+                    "examples": " | ".join(display.reindex(members[:MAX_EXAMPLES]).fillna("").tolist()),
+                })
+    return pd.DataFrame(rows, columns=EVENT_COLS)
+
+
+def find_comovement(store_dir=STORE_DIR, base_dir=DATA_DIR, today=None, days=30,
+                    min_products=MIN_PRODUCTS, min_share=MIN_SHARE) -> pd.DataFrame:
+    """
+    Repricing events over the `days` days ending today, from the compacted
+    store. Writes base_dir/<today>/comovement_<today>.csv and returns the events.
+    """
+    today = today or date.today()
+    start = today - timedelta(days=days)
+    window = pd.date_range(start, today, freq="D")
+
+    with stage("comovement.load"):
+        prices = load_prices(Path(store_dir), start - timedelta(days=LOOKBACK_DAYS), today)
+        products = load_products(Path(store_dir))
+        count("rows", len(prices))
+    n_products = int(products["product_id"].max()) + 1 if len(products) else 0
+    groups = groupings(products, n_products)
+
+    frames = []
+    with stage("comovement.score"):
+        for region, rows in prices.groupby("region", sort=True):
+            C, O = change_matrices(rows, window, n_products)
+            count("price_changes", C.nnz)
+            frames.append(find_events(C, O, groups, window, products, region, min_products, min_share))
+
+    events = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=EVENT_COLS)
+    events = events.sort_values(
+        ["date", "group_type", "share_changed"], ascending=[False, True, False], kind="mergesort"
+    )
+
+    folder = os.path.join(base_dir, today.strftime("%Y%m%d"))
+    os.makedirs(folder, exist_ok=True)
+    out_path = os.path.join(folder, f"comovement_{today.strftime('%Y%m%d')}.csv")
+    events.to_csv(out_path, index=False)
+    print(f"{len(events)} co-movement events saved to {out_path}")
+    return events
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find same-day repricing across brands and categories.")
+    parser.add_argument("--store", default=str(STORE_DIR))
+    parser.add_argument("--data", default=str(DATA_DIR))
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--today", type=date.fromisoformat, default=None)
+    args = parser.parse_args()
+    events = find_comovement(args.store, args.data, args.today, args.days)
+    if len(events):
+        print(events.drop(columns=["product_ids"]).head(20).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
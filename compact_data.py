@@ -0,0 +1,419 @@
+# compact_data.py
+"""
+Compact the raw data/YYYYMMDD/*.csv scrapes into one optimized store:
+
+    store/
+      manifest.json          per-day sources (sha1, encoding, rows), row-count
+                             verification and the derived files that were skipped
+      products.csv           product index: product_id, brand, name, category,
+                             first_date, last_date
+      prices/YYYYMMDD.parquet  one immutable partition per day, deduplicated
+                             per (region, product) and sorted by region, product_id
+
+Per-region scrapes (YYYYMMDD/<region>/*.csv) are ingested with their region;
+files directly in the day folder are the "default" region. Product IDs are
+shared across regions.
+
+Derived outputs (combined_*, price_anomalies_*, comovement_*) are never
+ingested; they stay in their day folders and are only listed in the manifest.
+
+Re-running only rebuilds days whose source files changed or are new.
+The store is the published copy of every day's prices (raw CSVs are not
+committed), so a partition is kept when its raw day folder is missing,
+e.g. in a fresh clone; --prune removes such days explicitly.
+
+Usage:
+    python compact_data.py [--full] [--verify] [--prune]
+"""
+import os
+import json
+import hashlib
+import argparse
+from pathlib import Path
+from datetime import datetime
+import pandas as pd
+from csv_reader import get_encoding, is_derived_csv, list_raw_csvs, parse_date_folder, read_many, region_of
+
+DATA_DIR = Path(__file__).resolve().parent / "data"
+STORE_DIR = Path(__file__).resolve().parent / "store"
+
+MANIFEST_VERSION = 2
+PRICE_COLS = ["region", "product_id", "date", "price", "weight", "category"]
+PRODUCT_COLS = ["product_id", "brand", "name", "category", "first_date", "last_date"]
+
+
+class CompactionError(RuntimeError):
+    """Row counts in the store don't add up to the source files."""
+
+
+def _sha1(path: Path) -> str:
+    h = hashlib.sha1()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _write_json(path: Path, obj):
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(obj, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def load_manifest(store_dir: Path = STORE_DIR) -> dict:
+    try:
+        with (store_dir / "manifest.json").open("r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {"version": MANIFEST_VERSION, "days": {}, "derived": {}}
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {"version": MANIFEST_VERSION, "days": {}, "derived": {}}
+    return manifest
+
+
+def load_products(store_dir: Path = STORE_DIR) -> pd.DataFrame:
+    path = store_dir / "products.csv"
+    if not path.is_file():
+        return pd.DataFrame(columns=PRODUCT_COLS)
+    return pd.read_csv(path, dtype={"brand": str, "name": str, "category": str}, keep_default_na=False)
+
+
+def normalize_file(df: pd.DataFrame, path: Path):
+    """
+    Turn one raw category DataFrame into rows of brand, name, weight, price,
+    category, region. Returns (rows, source_rows, invalid_rows).
+    """
+    cols = ["brand", "name", "weight", "price", "category", "region"]
+    source_rows = len(df)
+    if df.empty:
+        return pd.DataFrame(columns=cols), source_rows, source_rows
+    df = df.copy()
+    df.columns = [str(c).lower().strip() for c in df.columns]
+    if not {"name", "price"}.issubset(df.columns):
+        return pd.DataFrame(columns=cols), source_rows, source_rows
+    for col in ("brand", "weight"):
+        if col not in df.columns:
+            df[col] = ""
+    # bakery-bread_nutrition.csv is the same category as bakery-bread.csv
+    rows = df[["brand", "name", "weight", "price"]].assign(
+        category=path.stem.removesuffix("_nutrition"), region=region_of(path))
+    for col in ("brand", "name", "weight"):
+        rows[col] = rows[col].fillna("").astype(str).str.strip()
+    rows["price"] = pd.to_numeric(
+        rows["price"].astype(str).str.replace(r"[\$,]", "", regex=True).str.strip(),
+        errors="coerce",
+    )
+    valid = rows["price"].notna() & (rows["name"] != "")
+    return rows[valid], source_rows, source_rows - int(valid.sum())
+
+
+def normalize_day(frames, files):
+    """
+    Turn one day's raw DataFrames into rows of region, brand, name, weight,
+    price, category. Returns (rows, source_rows, invalid_rows).
+    """
+    parts = [normalize_file(df, Path(path)) for path, df in zip(files, frames)]
+    source_rows = sum(p[1] for p in parts)
+    invalid_rows = sum(p[2] for p in parts)
+    rows = [p[0] for p in parts if len(p[0])]
+    if not rows:
+        return pd.DataFrame(columns=["region", "brand", "name", "weight", "price", "category"]), source_rows, invalid_rows
+    return pd.concat(rows, ignore_index=True), source_rows, invalid_rows
+
+
+def assign_product_ids(day: pd.DataFrame, products: pd.DataFrame, d):
+    """
+    Map (brand, name) to stable product IDs, appending unseen products.
+    Returns (day with a product_id column, updated products).
+    """
+    keys = day[["brand", "name", "category"]].drop_duplicates(["brand", "name"])
+    known = products.set_index(["brand", "name"])["product_id"]
+    idx = pd.MultiIndex.from_frame(keys[["brand", "name"]])
+    new = keys[~idx.isin(known.index)]
+
+    next_id = int(products["product_id"].max()) + 1 if len(products) else 0
+    if len(new):
+        new = new.sort_values(["brand", "name"]).assign(
+            product_id=range(next_id, next_id + len(new)),
+            first_date=d.isoformat(),
+            last_date=d.isoformat(),
+        )
+        products = pd.concat([products, new[PRODUCT_COLS]], ignore_index=True)
+
+    lookup = products.set_index(["brand", "name"])["product_id"]
+    ids = lookup.reindex(pd.MultiIndex.from_frame(day[["brand", "name"]])).to_numpy()
+    seen = products["product_id"].isin(ids)
+    products.loc[seen, "first_date"] = products.loc[seen, "first_date"].where(
+        products.loc[seen, "first_date"] <= d.isoformat(), d.isoformat())
+    products.loc[seen, "last_date"] = products.loc[seen, "last_date"].where(
+        products.loc[seen, "last_date"] >= d.isoformat(), d.isoformat())
+    return day.assign(product_id=ids.astype("int64")), products
+
+
+def compact(data_dir: Path = DATA_DIR, store_dir: Path = STORE_DIR, full: bool = False, days=None,
+            prune: bool = False) -> dict:
+    """
+    Ingest every raw CSV under data_dir into store_dir. Days whose sources are
+    unchanged since the last run are skipped unless full=True. With days (an
+    iterable of dates), only those days are looked at and every other stored
+    day is left as is; the streaming pipeline uses this to fold in each
+    category as soon as it is scraped. Stored days whose raw folder is gone
+    are kept unless prune=True. Returns the updated manifest.
+    """
+    data_dir, store_dir = Path(data_dir), Path(store_dir)
+    (store_dir / "prices").mkdir(parents=True, exist_ok=True)
+
+    only = None if days is None else set(days)
+    by_day = {}
+    for d, path in list_raw_csvs(data_dir, include_regions=True):
+        if only is None or d in only:
+            by_day.setdefault(d, []).append(path)
+
+    stored = load_manifest(store_dir)
+    # Stored days with no raw folder; in scope only for the days looked at
+    gone = set(stored["days"]) - {d.strftime("%Y%m%d") for d in by_day}
+    if only is not None:
+        gone &= {d.strftime("%Y%m%d") for d in only}
+    if full and gone and not prune:
+        # A full rebuild renumbers products, so it can't keep partitions it doesn't rebuild
+        raise CompactionError(
+            f"--full would drop {len(gone)} stored day(s) with no raw sources "
+            f"({min(gone)}..{max(gone)}); restore data/ or pass --prune"
+        )
+
+    manifest = {"version": MANIFEST_VERSION, "days": {}, "derived": {}} if full else stored
+    products = pd.DataFrame(columns=PRODUCT_COLS) if full else load_products(store_dir)
+
+    # Derived outputs are recorded, never ingested
+    manifest["derived"] = {}
+    for sub in sorted(data_dir.iterdir()):
+        if sub.is_dir() and parse_date_folder(sub.name):
+            derived = sorted(p.name for p in sub.glob("*.csv") if is_derived_csv(p))
+            if derived:
+                manifest["derived"][sub.name] = derived
+
+    replaced = set()
+    for d in sorted(by_day):
+        key = d.strftime("%Y%m%d")
+        files = by_day[d]
+        partition = store_dir / "prices" / f"{key}.parquet"
+        sources = [{"file": p.relative_to(data_dir / key).as_posix(), "sha1": _sha1(p)} for p in files]
+
+        prev = manifest["days"].get(key)
+        if prev and partition.is_file() and [
+            (s["file"], s["sha1"]) for s in prev["sources"]
+        ] == [(s["file"], s["sha1"]) for s in sources]:
+            continue
+
+        if prev:
+            replaced.add(key)
+        frames = read_many(files)
+        day, source_rows, invalid_rows = normalize_day(frames, files)
+        for s, (path, df) in zip(sources, zip(files, frames)):
+            s["encoding"] = get_encoding(path)
+            s["rows"] = len(df)
+        products = _write_day(store_dir, manifest, products, d, day, sources, source_rows, invalid_rows)
+
+    # Days whose raw folder disappeared stay in the store unless pruning was asked for
+    if prune:
+        for key in gone:
+            (store_dir / stored["days"][key]["partition"]).unlink(missing_ok=True)
+            manifest["days"].pop(key, None)
+    elif gone:
+        print(f"Kept {len(gone)} stored day(s) with no raw sources (use --prune to remove them).")
+
+    # assign_product_ids only widens first_date/last_date; a pruned or rebuilt
+    # day may have been a product's only day at either end
+    removed = gone if prune else set()
+    changed = {datetime.strptime(key, "%Y%m%d").date().isoformat() for key in removed | replaced}
+    if changed & (set(products["first_date"]) | set(products["last_date"])):
+        products = recompute_date_bounds(store_dir, manifest, products)
+
+    _save(store_dir, manifest, products)
+    return manifest
+
+
+def recompute_date_bounds(store_dir: Path, manifest: dict, products: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reset every product's first_date/last_date to the first and last day it
+    appears in the stored partitions. Products with no rows left keep their
+    old dates (and their ID) so later scrapes map back to them.
+    """
+    parts = [
+        pd.read_parquet(store_dir / day["partition"], columns=["product_id", "date"])
+        for day in manifest["days"].values()
+    ]
+    if not parts:
+        return products
+    rows = pd.concat(parts, ignore_index=True)
+    rows["date"] = pd.to_datetime(rows["date"]).dt.strftime("%Y-%m-%d")
+    bounds = rows.groupby("product_id")["date"].agg(["min", "max"])
+    ids = products["product_id"]
+    return products.assign(
+        first_date=ids.map(bounds["min"]).fillna(products["first_date"]),
+        last_date=ids.map(bounds["max"]).fillna(products["last_date"]),
+    )
+
+
+def _write_day(store_dir: Path, manifest: dict, products: pd.DataFrame, d, day: pd.DataFrame,
+               sources: list, source_rows: int, invalid_rows: int) -> pd.DataFrame:
+    """
+    Write day d's partition from its normalized rows (sources in list_raw_csvs
+    order) and record it in manifest. Returns the updated products.
+    """
+    key = d.strftime("%Y%m%d")
+    partition = store_dir / "prices" / f"{key}.parquet"
+
+    # A product listed in two categories on the same day keeps its first row
+    deduped = day.drop_duplicates(["region", "brand", "name"], keep="first")
+    duplicate_rows = len(day) - len(deduped)
+
+    deduped, products = assign_product_ids(deduped, products, d)
+    out = deduped.assign(date=d)[PRICE_COLS].sort_values(["region", "product_id"], kind="mergesort")
+    tmp = partition.with_suffix(".parquet.tmp")
+    out.to_parquet(tmp, index=False)
+    os.replace(tmp, partition)
+
+    rows = len(out)
+    if source_rows != rows + invalid_rows + duplicate_rows:
+        raise CompactionError(f"{key}: {source_rows} source rows != {rows} + {invalid_rows} invalid + {duplicate_rows} duplicates")
+    if pd.read_parquet(partition, columns=["product_id"]).shape[0] != rows:
+        raise CompactionError(f"{key}: partition row count does not match {rows}")
+
+    manifest["days"][key] = {
+        "sources": sources,
+        "source_rows": source_rows,
+        "invalid_rows": invalid_rows,
+        "duplicate_rows": duplicate_rows,
+        "rows": rows,
+        "partition": partition.relative_to(store_dir).as_posix(),
+    }
+    print(f"{key}: {rows} rows ({invalid_rows} invalid, {duplicate_rows} duplicates) -> {partition.name}")
+    return products
+
+
+def _save(store_dir: Path, manifest: dict, products: pd.DataFrame):
+    manifest["products"] = len(products)
+    manifest["rows"] = sum(day["rows"] for day in manifest["days"].values())
+    manifest["updated"] = datetime.now().isoformat(timespec="seconds")
+
+    products.sort_values("product_id").to_csv(store_dir / "products.csv", index=False)
+    _write_json(store_dir / "manifest.json", manifest)
+
+
+def _source_order(data_dir: Path, d, path: Path):
+    """Sort key giving list_raw_csvs' order: the day folder's files, then region subfolders."""
+    rel = path.relative_to(data_dir / d.strftime("%Y%m%d"))
+    return (len(rel.parts) > 1, rel.as_posix())
+
+
+class DayAppender:
+    """
+    Builds one day's partition a source file at a time, for the streaming
+    pipeline. Each added CSV is read, hashed and normalized once and kept in
+    memory; earlier files are never read again. Parquet files can't be
+    appended to, so every add() rewrites the day's partition from the
+    normalized rows so far. That is a concat plus one write of at most a
+    day of rows.
+
+    IDs are assigned afresh from the products known before the day on every
+    write, so after the last file the partition, products.csv and manifest
+    are exactly what compact() writes for the same files. Until then, the
+    IDs of products new today can shift as categories arrive.
+    """
+
+    def __init__(self, data_dir: Path, store_dir: Path, d):
+        self.data_dir, self.store_dir, self.d = Path(data_dir), Path(store_dir), d
+        (self.store_dir / "prices").mkdir(parents=True, exist_ok=True)
+        self.manifest = load_manifest(self.store_dir)
+        self.base_products = load_products(self.store_dir)
+        self.parts = {}  # path -> (rows, source entry, invalid_rows)
+
+    def add(self, path: Path):
+        """Upsert one raw CSV of the day (re-adding a file replaces its rows) and rewrite the partition."""
+        path = Path(path)
+        (df,) = read_many([path])
+        rows, source_rows, invalid_rows = normalize_file(df, path)
+        source = {
+            "file": path.relative_to(self.data_dir / self.d.strftime("%Y%m%d")).as_posix(),
+            "sha1": _sha1(path),
+            "encoding": get_encoding(path),
+            "rows": source_rows,
+        }
+        self.parts[path] = (rows, source, invalid_rows)
+
+        order = sorted(self.parts, key=lambda p: _source_order(self.data_dir, self.d, p))
+        frames = [self.parts[p][0] for p in order if len(self.parts[p][0])]
+        day = pd.concat(frames, ignore_index=True) if frames else normalize_day([], [])[0]
+        products = _write_day(
+            self.store_dir, self.manifest, self.base_products.copy(), self.d, day,
+            [self.parts[p][1] for p in order],
+            sum(self.parts[p][1]["rows"] for p in order),
+            sum(self.parts[p][2] for p in order),
+        )
+        _save(self.store_dir, self.manifest, products)
+
+
+def verify(data_dir: Path = DATA_DIR, store_dir: Path = STORE_DIR):
+    """Recount every source file and partition against the manifest; raises CompactionError on mismatch."""
+    data_dir, store_dir = Path(data_dir), Path(store_dir)
+    manifest = load_manifest(store_dir)
+    for key, day in sorted(manifest["days"].items()):
+        stored = pd.read_parquet(store_dir / day["partition"], columns=["region", "product_id"])
+        files = [data_dir / key / s["file"] for s in day["sources"]]
+        # Days kept without their raw folder (fresh clone) can only be checked against the manifest
+        source_rows = sum(len(df) for df in read_many(files)) if (data_dir / key).is_dir() else day["source_rows"]
+        if source_rows != day["source_rows"]:
+            raise CompactionError(f"{key}: sources now have {source_rows} rows, manifest says {day['source_rows']}")
+        if len(stored) != day["rows"] or stored.duplicated().any():
+            raise CompactionError(f"{key}: partition has {len(stored)} rows, manifest says {day['rows']}")
+    print(f"Verified {len(manifest['days'])} days, {manifest.get('rows', 0)} rows.")
+
+
+def load_prices(store_dir: Path = STORE_DIR, start=None, end=None, product_ids=None, region=None) -> pd.DataFrame:
+    """
+    Read the compacted store back as one DataFrame of
+    region, product_id, brand, name, date, price, weight, category.
+    start/end are inclusive date bounds; product_ids and region, if given,
+    are pushed down to the parquet reader so only matching rows are loaded.
+    """
+    store_dir = Path(store_dir)
+    manifest = load_manifest(store_dir)
+    keys = sorted(
+        k for k in manifest["days"]
+        if (start is None or k >= start.strftime("%Y%m%d")) and (end is None or k <= end.strftime("%Y%m%d"))
+    )
+    if not keys:
+        return pd.DataFrame(columns=PRICE_COLS + ["brand", "name"])
+
+    filters = []
+    if product_ids is not None:
+        filters.append(("product_id", "in", [int(i) for i in product_ids]))
+    if region is not None:
+        filters.append(("region", "==", region))
+    prices = pd.concat(
+        [pd.read_parquet(store_dir / manifest["days"][k]["partition"], filters=filters or None) for k in keys],
+        ignore_index=True,
+    )
+    products = load_products(store_dir)[["product_id", "brand", "name"]]
+    return prices.merge(products, on="product_id", how="left")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact data/ into the store/ dataset.")
+    parser.add_argument("--data", default=str(DATA_DIR))
+    parser.add_argument("--store", default=str(STORE_DIR))
+    parser.add_argument("--full", action="store_true", help="rebuild every day instead of only new/changed ones")
+    parser.add_argument("--verify", action="store_true", help="recount sources and partitions after compacting")
+    parser.add_argument("--prune", action="store_true", help="remove stored days whose raw folder is gone")
+    args = parser.parse_args()
+
+    manifest = compact(Path(args.data), Path(args.store), full=args.full, prune=args.prune)
+    print(f"Store has {len(manifest['days'])} days, {manifest['rows']} rows, {manifest['products']} products.")
+    if args.verify:
+        verify(Path(args.data), Path(args.store))
+
+
+if __name__ == "__main__":
+    main()
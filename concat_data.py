@@ -1,78 +1,86 @@
-import os, re, glob
+import os
 import pandas as pd
-from datetime import date
+from datetime import date, timedelta
+from csv_reader import list_raw_csvs, load_encoding_cache, read_many, region_of, save_encoding_cache
+from instrumentation import count, stage
+from windows import DEFAULT_WINDOW_DAYS
+
+DATA_DIR = r"C:\Users\cools\grocery\aldi\data"
 
 
-def concat_data():
+def concat_data(base_dir=DATA_DIR, today=None, days=DEFAULT_WINDOW_DAYS):
+    """
+    Combine the last `days` days of raw CSVs under base_dir into
+    base_dir/<today>/combined_<start>_to_<today>.csv and return its path.
+    """
     # --- Config ---
-    BASE_DIR = r"C:\Users\cools\grocery\aldi\data"
+    BASE_DIR = base_dir
 
-    today = date.today()
+    today = today or date.today()
 
 
-    # 30 days ago (inclusive) as yyyymmdd string
-    start_date = today - timedelta(days=30)
+    # `days` days ago (inclusive) as yyyymmdd string
+    start_date = today - timedelta(days=days)
     START_STR = start_date.strftime("%Y%m%d")
-    END_STR = date.today().strftime("%Y%m%d")  # auto today
+    END_STR = today.strftime("%Y%m%d")  # auto today
     USECOLS = ["brand", "name", "weight", "price"]
 
-    # --- Helpers ---
-    def is_date_folder(name):
-        return bool(re.fullmatch(r"\d{8}", name))
-
-    # --- Find date folders ---
-    date_folders = [
-        os.path.join(BASE_DIR, f)
-        for f in os.listdir(BASE_DIR)
-        if is_date_folder(f) and START_STR <= f <= END_STR
+    # --- Find raw CSVs in the date range (derived combined/anomaly files are skipped) ---
+    csv_paths = [
+        (d, p)
+        for d, p in list_raw_csvs(BASE_DIR, include_regions=True)
+        if START_STR <= d.strftime("%Y%m%d") <= END_STR
     ]
 
-    # --- Load and combine ---
+    # --- Load and combine (files are read concurrently) ---
+    # Encodings detected on earlier runs are recorded next to the data
+    encoding_cache = os.path.join(BASE_DIR, ".encodings.json")
+    load_encoding_cache(encoding_cache)
+    with stage("concat.read", files=len(csv_paths)):
+        raw_frames = read_many(p for _, p in csv_paths)
+        count("files", len(csv_paths))
+        count("source_rows", sum(len(df) for df in raw_frames))
+
     frames = []
-    for folder in sorted(date_folders):
-        for csv_path in glob.glob(os.path.join(folder, "*.csv")):
-            
-            if "combined" in str(csv_path) or "anomalies" in str(csv_path):
-                print("continuing")
-                continue
-            try:
-                df = pd.read_csv(csv_path)
-            except Exception as e:
-                
-                continue
-
-            # normalize column names
-            df.columns = [c.lower().strip() for c in df.columns]
-
-            # we only *require* name + price; brand can be missing
-            if not {"name", "price"}.issubset(df.columns):
-                continue
-
-            # make sure all USECOLS exist; fill missing brand/weight as empty string
-            for col in USECOLS:
-                if col not in df.columns:
-                    if col in ["brand", "name", "weight"]:
-                        df[col] = ""
-                    else:
-                        df[col] = pd.NA
-
-            # keep only the columns we care about (now guaranteed to exist)
-            df = df[USECOLS].copy()
-
-            # add date from folder name
-            df["date"] = pd.to_datetime(os.path.basename(folder), format="%Y%m%d").date()
-
-            # clean price column
-            df["price"] = (
-                df["price"]
-                .astype(str)
-                .str.replace(r"[\$,]", "", regex=True)
-                .str.strip()
-            )
-            df["price"] = pd.to_numeric(df["price"], errors="coerce")
+    for (d, csv_path), df in zip(csv_paths, raw_frames):
+        if df.empty:
+            continue
+
+        # normalize column names
+        df.columns = [c.lower().strip() for c in df.columns]
+
+        # we only *require* name + price; brand can be missing
+        if not {"name", "price"}.issubset(df.columns):
+            continue
+
+        # make sure all USECOLS exist; fill missing brand/weight as empty string
+        for col in USECOLS:
+            if col not in df.columns:
+                if col in ["brand", "name", "weight"]:
+                    df[col] = ""
+                else:
+                    df[col] = pd.NA
+
+        # keep only the columns we care about (now guaranteed to exist)
+        df = df[USECOLS].copy()
+
+        # add date from folder name, region from the subfolder (if any)
+        df["date"] = d
+        df["region"] = region_of(csv_path)
+
+        # clean price column
+        df["price"] = (
+            df["price"]
+            .astype(str)
+            .str.replace(r"[\$,]", "", regex=True)
+            .str.strip()
+        )
+        df["price"] = pd.to_numeric(df["price"], errors="coerce")
            
 
-            frames.append(df)
+        frames.append(df)
+
+    save_encoding_cache(encoding_cache)
 
     if not frames:
         raise SystemExit("No data found in range.")
@@ -91,29 +99,248 @@ def concat_data():
     os.makedirs(today_folder, exist_ok=True)
 
     output_path = os.path.join(today_folder, f"combined_{START_STR}_to_{END_STR}.csv")
-    combined.to_csv(output_path, index=False)
+    with stage("concat.write", rows=len(combined)):
+        combined.to_csv(output_path, index=False)
     print("Combined CSV saved to:")
     print(output_path)
+    return output_path
 
 
 import os
+import json
 from datetime import date, timedelta
 
 import numpy as np
 import pandas as pd
 from sklearn.ensemble import IsolationForest
 from pandas.api.types import is_categorical_dtype
-def get_anomalies():
+from windows import SlidingWindow
+
+ANOMALY_STATE_VERSION = 1
+ANOMALY_STATE_FILE = ".anomaly_state.json"
+MANUAL_THRESHOLD_PCT = 30.0  # e.g. 30%+ drop or spike will be caught
+
+
+def score_latest_price(unique_prices, latest_price, manual_threshold_pct=30.0, window_days=DEFAULT_WINDOW_DAYS):
+    """
+    Judge latest_price against the UNIQUE prices of its window_days window (in
+    the order they were first seen). Returns None when it isn't an anomaly, else
+    the median_price_30d, pct_diff_vs_30d_median, direction and reason fields.
+    The field names stay fixed; the direction/reason values name the window.
+    """
+    # If only one unique price and latest equals it, there's nothing "weird"
+    if len(unique_prices) == 1 and np.isclose(latest_price, unique_prices[0]):
+        return None
+
+    # If we don't have at least a few distinct levels, ML isn't helpful
+    if len(unique_prices) < 3:
+        # Simple % diff vs median of window
+        median_price = float(np.median(unique_prices))
+        pct_diff_vs_median = (latest_price - median_price) / median_price * 100.0
+        is_manual_flag = abs(pct_diff_vs_median) >= manual_threshold_pct
+        is_model_anom = False
+    else:
+        # --- IsolationForest on UNIQUE prices in the window
+        X = np.asarray(unique_prices).reshape(-1, 1)
+
+        iso = IsolationForest(
+            contamination=0.01,   # very small anomaly fraction
+            n_estimators=80,
+            max_samples="auto",
+            random_state=42,
+            n_jobs=1,
+        )
+        iso.fit(X)
+        count("isolation_forest_fits")
+
+        # Ask the model if the *current* price is weird compared to the unique set
+        pred_latest = iso.predict([[latest_price]])[0]  # -1 = anomaly
+        is_model_anom = bool(pred_latest == -1)
+
+        # Manual rule: compare latest price to median of unique prices in the window
+        median_price = float(np.median(unique_prices))
+        pct_diff_vs_median = (latest_price - median_price) / median_price * 100.0
+        is_manual_flag = abs(pct_diff_vs_median) >= manual_threshold_pct
+
+    is_anomaly = is_model_anom or is_manual_flag
+    if not is_anomaly:
+        return None
+
+    # Direction relative to median of the window's unique prices
+    if pct_diff_vs_median > 0:
+        direction = f"higher_vs_{window_days}d_median"
+    elif pct_diff_vs_median < 0:
+        direction = f"lower_vs_{window_days}d_median"
+    else:
+        direction = "no_change"
+
+    reasons = []
+    if is_model_anom:
+        reasons.append(f"model_{window_days}d_unique")
+    if is_manual_flag:
+        reasons.append(f"median_diff_{manual_threshold_pct:.0f}pct")
+
+    return {
+        "median_price_30d": round(median_price, 2),
+        "pct_diff_vs_30d_median": round(pct_diff_vs_median, 2),
+        "direction": direction,
+        "reason": "|".join(reasons),
+    }
+
+
+def _load_anomaly_state(path, manual_threshold_pct, window_days=DEFAULT_WINDOW_DAYS):
+    """{(region, brand, name): (latest_price, window_prices, verdict)} from the last incremental run."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if state.get("version") != ANOMALY_STATE_VERSION or state.get("threshold_pct") != manual_threshold_pct:
+        return {}
+    # Verdicts scored over a different window length don't carry over
+    if state.get("window_days", DEFAULT_WINDOW_DAYS) != window_days:
+        return {}
+    return {tuple(p[:3]): (p[3], tuple(p[4]), p[5]) for p in state["products"]}
+
+
+def _save_anomaly_state(path, products, manual_threshold_pct, window_days=DEFAULT_WINDOW_DAYS):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({
+            "version": ANOMALY_STATE_VERSION,
+            "threshold_pct": manual_threshold_pct,
+            "window_days": window_days,
+            "products": [[*key, latest, list(prices), verdict] for key, (latest, prices, verdict) in products.items()],
+        }, f)
+    os.replace(tmp, path)
+
+
+def _score_incremental(df, previous, current, manual_threshold_pct, window_days=DEFAULT_WINDOW_DAYS):
+    """
+    Same results as the full loop in get_anomalies, but each product's verdict
+    is reused from previous (see _load_anomaly_state) while its latest price
+    and the unique prices in its window are unchanged. Only products
+    with a new price, or with a price that left the window, are scored again.
+    Every scored product's entry is put in current. df must be sorted by
+    region, brand, name, date.
+    """
+    results = []
+
+    # Plain arrays and group boundaries instead of a groupby per product
+    group = df.groupby(["region", "brand", "name"], sort=False, observed=True).ngroup().to_numpy()
+    bounds = np.r_[0, np.flatnonzero(np.diff(group)) + 1, len(df)]
+    regions = df["region"].to_numpy()
+    brands = df["brand"].to_numpy()
+    names = df["name"].to_numpy()
+    weights = df["weight"].to_numpy()
+    prices = df["price"].to_numpy(dtype=float)
+    days = df["date"].to_numpy().astype("datetime64[D]")
+    day_numbers = days.astype(np.int64)
+
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        count("products")
+        # Need enough history overall
+        if hi - lo < 3:
+            continue
+
+        key = (str(regions[lo]), str(brands[lo]), str(names[lo]))
+        latest_price = float(prices[hi - 1])
+        latest_day = days[hi - 1]
+        window = SlidingWindow(window_days, include_start=True)
+        for day, price in zip(day_numbers[lo:hi].tolist(), prices[lo:hi].tolist()):
+            window.push(day, price)
+        unique_prices = tuple(window.unique_values())
+
+        prev = previous.get(key)
+        if prev is not None and prev[0] == latest_price and prev[1] == unique_prices:
+            verdict = prev[2]
+        else:
+            count("rescored")
+            verdict = score_latest_price(np.array(unique_prices), latest_price, manual_threshold_pct, window_days)
+        current[key] = (latest_price, unique_prices, verdict)
+
+        if verdict is not None:
+            results.append({
+                "region": key[0],
+                "brand": key[1],
+                "name": key[2],
+                "weight": str(weights[hi - 1]),
+                "latest_date": pd.Timestamp(latest_day).date(),
+                "latest_price": latest_price,
+                **verdict,
+            })
+
+    return results
+
+
+def prepare_anomaly_frame(df):
+    """
+    Rows of region, brand, name, weight, price, date ready for scoring: no
+    missing price/date, a region on every row, "(no brand)" for missing
+    brands, sorted by region, brand, name, date.
+    """
+    df = df.dropna(subset=["price", "date"])
+
+    # Combined files from before multi-region scraping have no region column
+    if "region" not in df.columns:
+        df["region"] = "default"
+
+    # --- Make sure missing brands are handled instead of dropped in groupby ---
+    missing_brand_label = "(no brand)"
+
+    if is_categorical_dtype(df["brand"]):
+        # Add the placeholder to the categories, then fillna
+        df["brand"] = df["brand"].cat.add_categories([missing_brand_label]).fillna(missing_brand_label)
+    else:
+        df["brand"] = df["brand"].fillna(missing_brand_label)
+
+    # Optionally, normalize empty strings to the same placeholder
+    df["brand"] = df["brand"].replace("", missing_brand_label)
+
+    return df.sort_values(["region", "brand", "name", "date"], kind="mergesort")
+
+
+def write_anomalies(results, folder, today_str, window_days=DEFAULT_WINDOW_DAYS):
+    """Save the anomaly rows as folder/price_anomalies_<today_str>.csv (if any) and return them as a DataFrame."""
+    out = pd.DataFrame(results)
+    count("anomalies", len(out))
+    out_path = os.path.join(folder, f"price_anomalies_{today_str}.csv")
+
+    if not out.empty:
+        out.to_csv(out_path, index=False)
+        print(f"{len(out)} anomalies saved to {out_path}")
+        print(out)
+    else:
+        print(f"No anomalies detected for latest prices (vs unique prices in last {window_days} days).")
+    return out
+
+
+def get_anomalies(base_dir=DATA_DIR, today=None, incremental=False,
+                  window_days=DEFAULT_WINDOW_DAYS, manual_threshold_pct=MANUAL_THRESHOLD_PCT):
+    """
+    Score the latest price of every product in today's combined CSV and write
+    base_dir/<today>/price_anomalies_<today>.csv. Returns the anomalies DataFrame.
+
+    Each latest price is compared with the unique prices of the window_days
+    days before it; the combined CSV must cover at least that many days
+    (concat_data(days=window_days)). The output columns keep their _30d
+    names whatever the window (the dashboard reads them); the direction and
+    reason values name the actual window, e.g. lower_vs_7d_median.
+
+    With incremental=True, per-product window prices and verdicts are kept in
+    base_dir/.anomaly_state.json and only products whose prices changed are
+    rescored; the output is the same as a full run.
+    """
 
     # ----------------------------
     # 1) Paths (auto-adjust to today's date)
     # ----------------------------
-    BASE_DIR = r"C:\Users\cools\grocery\aldi"
+    BASE_DIR = base_dir
 
 
-    today = date.today()
+    today = today or date.today()
     today_str = today.strftime("%Y%m%d")
-    start_date = today - timedelta(days=30)
+    start_date = today - timedelta(days=window_days)
     START_STR = start_date.strftime("%Y%m%d")
     folder = os.path.join(BASE_DIR, today_str)
     csv_path = os.path.join(folder, f"combined_{START_STR}_to_{today_str}.csv")
@@ -126,142 +353,79 @@ def get_anomalies():
             return pd.NA
         return float(str(x).replace("$", "").replace(",", "").strip())
 
-    usecols = ["brand", "name", "weight", "price", "date"]
+    usecols = lambda c: c in ("region", "brand", "name", "weight", "price", "date")
     dtypes = {
+        "region": "category",
         "brand": "category",
         "name": "category",
         "weight": "category",
     }
 
-    df = pd.read_csv(
-        csv_path,
-        usecols=usecols,
-        dtype=dtypes,
-        converters={"price": _parse_price},
-        parse_dates=["date"],
-        engine="c",
-    )
+    with stage("anomalies.load"):
+        df = pd.read_csv(
+            csv_path,
+            usecols=usecols,
+            dtype=dtypes,
+            converters={"price": _parse_price},
+            parse_dates=["date"],
+            engine="c",
+        )
+        count("rows", len(df))
 
-    df = df.dropna(subset=["price", "date"])
-
-    # --- Make sure missing brands are handled instead of dropped in groupby ---
-    missing_brand_label = "(no brand)"
-
-    if is_categorical_dtype(df["brand"]):
-        # Add the placeholder to the categories, then fillna
-        df["brand"] = df["brand"].cat.add_categories([missing_brand_label]).fillna(missing_brand_label)
-    else:
-        df["brand"] = df["brand"].fillna(missing_brand_label)
-
-    # Optionally, normalize empty strings to the same placeholder
-    df["brand"] = df["brand"].replace("", missing_brand_label)
-
-    df = df.sort_values(["brand", "name", "date"], kind="mergesort")
+    df = prepare_anomaly_frame(df)
 
     # ----------------------------
     # 3) Detect anomalies for the latest price of each (brand, name)
-    #    - Compare latest price against all UNIQUE prices in the last 30 days
+    #    - Compare latest price against all UNIQUE prices in the last window_days days
     # ----------------------------
     results = []
-    manual_threshold_pct = 30.0  # e.g. 30%+ drop or spike will be caught
-
-    for (brand, name), sub in df.groupby(["brand", "name"], sort=False):
-        # Need enough history overall
-        if len(sub) < 3:
-            continue
-
-        sub = sub.sort_values("date", kind="mergesort")
-        latest_row = sub.iloc[-1]
-        latest_price = float(latest_row["price"])
-        latest_date = latest_row["date"].date()
-        latest_weight = str(latest_row["weight"])
-
-        # 30-day window ending at latest_date (inclusive)
-        window_start = latest_date - timedelta(days=30)
-        #print("window start", window_start)
-        window_mask = (sub["date"].dt.date >= window_start) & (sub["date"].dt.date <= latest_date)
-        window_sub = sub.loc[window_mask]
-
-        if window_sub.empty:
-            continue
-        
-        # Unique prices in that 30-day window (including the latest day)
-        unique_prices = window_sub["price"].dropna().unique()
-        if window_sub.iloc[0]['name'] == "Black Forest Bacon, 12 oz":
-            print(unique_prices)
-
-        # If only one unique price and latest equals it, there's nothing "weird"
-        if len(unique_prices) == 1 and np.isclose(latest_price, unique_prices[0]):
-            continue
 
-        # If we don't have at least a few distinct levels, ML isn't helpful
-        if len(unique_prices) < 3:
-            # Simple % diff vs median of window
-            median_price = float(np.median(unique_prices))
-            pct_diff_vs_median = (latest_price - median_price) / median_price * 100.0
-            is_manual_flag = abs(pct_diff_vs_median) >= manual_threshold_pct
-            is_model_anom = False
-        else:
-            # --- IsolationForest on UNIQUE prices in last 30 days
-            X = unique_prices.reshape(-1, 1)
-
-            iso = IsolationForest(
-                contamination=0.01,   # very small anomaly fraction
-                n_estimators=80,
-                max_samples="auto",
-                random_state=42,
-                n_jobs=1,
-            )
-            iso.fit(X)
-
-            # Ask the model if the *current* price is weird compared to the unique set
-            pred_latest = iso.predict([[latest_price]])[0]  # -1 = anomaly
-            is_model_anom = (pred_latest == -1)
-
-            # Manual rule: compare latest price to median of unique prices in the window
-            median_price = float(np.median(unique_prices))
-            pct_diff_vs_median = (latest_price - median_price) / median_price * 100.0
-            is_manual_flag = abs(pct_diff_vs_median) >= manual_threshold_pct
-
-        is_anomaly = is_model_anom or is_manual_flag
-        if not is_anomaly:
-            continue  # only save true anomalies
-
-        # Direction relative to median of last-30-day unique prices
-        if pct_diff_vs_median > 0:
-            direction = "higher_vs_30d_median"
-        elif pct_diff_vs_median < 0:
-            direction = "lower_vs_30d_median"
+    with stage("anomalies.score", incremental=incremental):
+        if incremental:
+            state_path = os.path.join(BASE_DIR, ANOMALY_STATE_FILE)
+            current = {}
+            previous = _load_anomaly_state(state_path, manual_threshold_pct, window_days)
+            results = _score_incremental(df, previous, current, manual_threshold_pct, window_days)
+            _save_anomaly_state(state_path, current, manual_threshold_pct, window_days)
         else:
-            direction = "no_change"
-
-        reasons = []
-        if is_model_anom:
-            reasons.append("model_30d_unique")
-        if is_manual_flag:
-            reasons.append(f"median_diff_{manual_threshold_pct:.0f}pct")
-
-        results.append({
-            "brand": str(brand),
-            "name": str(name),
-            "weight": latest_weight,
-            "latest_date": latest_date,
-            "latest_price": latest_price,
-            "median_price_30d": round(median_price, 2),
-            "pct_diff_vs_30d_median": round(pct_diff_vs_median, 2),
-            "direction": direction,
-            "reason": "|".join(reasons),
-        })
+            # One pass over every (region, product); regions add rows, not passes
+            for (region, brand, name), sub in df.groupby(["region", "brand", "name"], sort=False, observed=True):
+                # Need enough history overall
+                count("products")
+                if len(sub) < 3:
+                    continue
+
+                sub = sub.sort_values("date", kind="mergesort")
+                latest_row = sub.iloc[-1]
+                latest_price = float(latest_row["price"])
+                latest_date = latest_row["date"].date()
+                latest_weight = str(latest_row["weight"])
+
+                # window_days window ending at latest_date (inclusive)
+                window = SlidingWindow(window_days, include_start=True)
+                for day, price in zip(sub["date"].dt.date, sub["price"]):
+                    window.push(day.toordinal(), price)
+
+                # Unique prices in that window (including the latest day)
+                unique_prices = np.array(window.unique_values())
+                if name == "Black Forest Bacon, 12 oz":
+                    print(unique_prices)
+
+                verdict = score_latest_price(unique_prices, latest_price, manual_threshold_pct, window_days)
+                if verdict is None:
+                    continue  # only save true anomalies
+
+                results.append({
+                    "region": str(region),
+                    "brand": str(brand),
+                    "name": str(name),
+                    "weight": latest_weight,
+                    "latest_date": latest_date,
+                    "latest_price": latest_price,
+                    **verdict,
+                })
 
     # ----------------------------
     # 4) Output anomalies only
     # ----------------------------
-    out = pd.DataFrame(results)
-    out_path = os.path.join(folder, f"price_anomalies_{today_str}.csv")
-
-    if not out.empty:
-        out.to_csv(out_path, index=False)
-        print(f"{len(out)} anomalies saved to {out_path}")
-        print(out)
-    else:
-        print("No anomalies detected for latest prices (vs unique prices in last 30 days).")
+    return write_anomalies(results, folder, today_str, window_days)
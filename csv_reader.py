@@ -0,0 +1,199 @@
+# csv_reader.py
+import os
+import re
+import csv
+import json
+import threading
+from io import BytesIO, StringIO
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+
+# Files written by the pipeline next to the raw scrapes; never treat them as raw data
+DERIVED_PREFIXES = ("combined_", "price_anomalies_", "comovement_")
+
+ENCODINGS = ("utf-8", "cp1252")
+DEFAULT_WORKERS = min(8, (os.cpu_count() or 1) * 2)
+
+_encoding_cache = {}
+_cache_lock = threading.Lock()
+
+
+def is_derived_csv(path) -> bool:
+    """True for pipeline outputs (combined_*, price_anomalies_*, comovement_*) rather than raw scrapes."""
+    return Path(path).name.startswith(DERIVED_PREFIXES)
+
+
+def parse_date_folder(folder_name: str):
+    """Return a date from a 'YYYYMMDD' folder name or None if not valid."""
+    if not re.fullmatch(r"\d{8}", folder_name):
+        return None
+    try:
+        return datetime.strptime(folder_name, "%Y%m%d").date()
+    except ValueError:
+        return None
+
+
+def region_of(path) -> str:
+    """Region a raw CSV belongs to: its subfolder under the day folder, else "default"."""
+    path = Path(path)
+    return "default" if parse_date_folder(path.parent.name) else path.parent.name
+
+
+def list_raw_csvs(base_dir, start=None, end=None, include_regions=False):
+    """
+    Return [(date, path), ...] for every raw CSV in base_dir/YYYYMMDD folders,
+    sorted by date then file name. start/end are inclusive date bounds.
+    With include_regions, files in per-region subfolders (YYYYMMDD/<region>/)
+    follow the default region's files for each day; use region_of() to tell
+    them apart.
+    """
+    out = []
+    for sub in sorted(Path(base_dir).iterdir(), key=lambda p: p.name):
+        if not sub.is_dir():
+            continue
+        d = parse_date_folder(sub.name)
+        if d is None or (start and d < start) or (end and d > end):
+            continue
+        for csv_path in sorted(sub.glob("*.csv")):
+            if not is_derived_csv(csv_path):
+                out.append((d, csv_path))
+        if include_regions:
+            for csv_path in sorted(sub.glob("*/*.csv")):
+                # Hidden folders (.partial scrape checkpoints) are not regions
+                if not is_derived_csv(csv_path) and not csv_path.parent.name.startswith("."):
+                    out.append((d, csv_path))
+    return out
+
+
+def detect_encoding(raw: bytes) -> str:
+    """Pick the encoding for a file's bytes: BOM, then utf-8, then cp1252, else latin-1."""
+    if raw.startswith(b"\xef\xbb\xbf"):
+        return "utf-8-sig"
+    for enc in ENCODINGS:
+        try:
+            raw.decode(enc)
+            return enc
+        except UnicodeDecodeError:
+            continue
+    # latin-1 decodes any byte sequence
+    return "latin-1"
+
+
+def _cache_key(path: Path):
+    st = path.stat()
+    return (str(path), st.st_size, st.st_mtime_ns)
+
+
+def load_encoding_cache(cache_file):
+    """Seed the in-process encoding cache from a JSON file written by save_encoding_cache."""
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+    except (OSError, ValueError):
+        return
+    with _cache_lock:
+        for e in entries:
+            _encoding_cache[(e["path"], e["size"], e["mtime_ns"])] = e["encoding"]
+
+
+def _is_current(key) -> bool:
+    """True if the file behind a cache key still exists unchanged."""
+    try:
+        return _cache_key(Path(key[0])) == key
+    except OSError:
+        return False
+
+
+def save_encoding_cache(cache_file):
+    """
+    Write the encoding cache to cache_file, dropping entries for files that
+    were deleted or rewritten since they were recorded (their keys can never
+    match again), so the file tracks the data directory instead of growing.
+    """
+    with _cache_lock:
+        for key in [k for k in _encoding_cache if not _is_current(k)]:
+            del _encoding_cache[key]
+        entries = [
+            {"path": p, "size": s, "mtime_ns": m, "encoding": enc}
+            for (p, s, m), enc in sorted(_encoding_cache.items())
+        ]
+    tmp = f"{cache_file}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(entries, f, indent=0)
+    os.replace(tmp, cache_file)
+
+
+def get_encoding(path) -> str:
+    """Encoding recorded for path (detected on the last read), or None if unseen."""
+    path = Path(path)
+    with _cache_lock:
+        return _encoding_cache.get(_cache_key(path))
+
+
+def _pick_engine(engine):
+    if engine != "auto":
+        return engine
+    try:
+        import pyarrow  # noqa: F401
+        return "pyarrow"
+    except ImportError:
+        return "c"
+
+
+def read_csv(path, engine="c") -> pd.DataFrame:
+    """
+    Read one CSV, detecting its encoding once from a single read of the bytes
+    and recording it. Malformed files fall back to Python's csv module;
+    returns an empty DataFrame if nothing works.
+
+    engine: "c" (default), "pyarrow", or "auto" (pyarrow when installed).
+    """
+    path = Path(path)
+    try:
+        key = _cache_key(path)
+        raw = path.read_bytes()
+    except OSError:
+        return pd.DataFrame()
+
+    with _cache_lock:
+        enc = _encoding_cache.get(key)
+    if enc is None:
+        enc = detect_encoding(raw)
+        with _cache_lock:
+            _encoding_cache[key] = enc
+
+    if not raw.strip():
+        return pd.DataFrame()
+
+    engine = _pick_engine(engine)
+    try:
+        if engine == "pyarrow":
+            data = raw if enc == "utf-8" else raw.decode(enc).encode("utf-8")
+            return pd.read_csv(BytesIO(data), engine="pyarrow")
+        return pd.read_csv(BytesIO(raw), encoding=enc, engine=engine)
+    except Exception:
+        pass
+
+    # Last resort: Python's csv module
+    try:
+        reader = list(csv.reader(StringIO(raw.decode(enc))))
+        if not reader:
+            return pd.DataFrame()
+        header, *rows = reader
+        return pd.DataFrame(rows, columns=header)
+    except Exception:
+        return pd.DataFrame()
+
+
+def read_many(paths, max_workers=DEFAULT_WORKERS, engine="c"):
+    """
+    Read many CSVs concurrently with a thread pool (file IO and the C parser
+    release the GIL). Returns DataFrames in the same order as paths.
+    """
+    paths = list(paths)
+    if max_workers <= 1 or len(paths) <= 1:
+        return [read_csv(p, engine=engine) for p in paths]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(lambda p: read_csv(p, engine=engine), paths))
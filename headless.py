@@ -6,8 +6,25 @@ async def create_undetected_headless_driver():
     Start Playwright async, launch headless Chromium,
     and return (playwright, browser, context, page).
     """
-    pw = await async_playwright().start()
-    browser = await pw.chromium.launch(headless=True)
+    pw, browser = await launch_browser()
     context = await browser.new_context()
     page = await context.new_page()
     return pw, browser, context, page
+
+
+async def launch_browser():
+    """
+    Start Playwright async and launch one headless Chromium shared by every
+    store; return (playwright, browser).
+    """
+    pw = await async_playwright().start()
+    browser = await pw.chromium.launch(headless=True)
+    return pw, browser
+
+
+async def new_store_context(browser):
+    """
+    Open an isolated context (own cookies/storage, so its own selected store)
+    in an already-running browser.
+    """
+    return await browser.new_context()
@@ -0,0 +1,203 @@
+# history_arrays.py
+"""
+Price history as memory-mapped, fixed-width arrays built from the store.
+
+    store/history/
+      current.json             which build is live and the manifest it came from
+      <build>/<region>/
+        product_id.npy         int32  one row per (product, day), sorted by product, day
+        day.npy                int32  days since 1970-01-01
+        price_cents.npy        int32
+        weight_id.npy          int32  index into weights.json
+        offsets.npy            int64  rows of product p are offsets[p]:offsets[p + 1]
+        weights.json           distinct weight strings
+
+Renamed products linked by identity.py share their canonical product_id,
+so one history spans every name the product had.
+
+Readers open the .npy files with mmap_mode="r". Every Streamlit session and
+every process on the machine shares the same OS page-cached copy, and one
+product's history is a slice of the mapped arrays: no copy, no scan.
+
+Builds are written to a fresh folder, and then current.json is swapped
+atomically, so readers never see a half-written build. open_history()
+rebuilds when the store's manifest or merge table changed since the live
+build, and keeps one mapped instance per build for the whole process.
+
+Usage:
+    python history_arrays.py [--store store]
+"""
+import os
+import json
+import time
+import shutil
+import argparse
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from compact_data import STORE_DIR, load_manifest, load_prices, load_products
+from identity import canonical_ids
+
+DEFAULT_REGION = "default"
+_open = {}
+_lock = threading.Lock()
+
+
+def _day_number(d) -> int:
+    """Days since 1970-01-01 for a date (the unit of day.npy)."""
+    return int(np.datetime64(d, "D").astype(np.int64))
+
+
+def _manifest_stamp(store_dir: Path) -> str:
+    parts = []
+    # The merge table is part of the stamp: accepting a rename changes the histories
+    for path in (store_dir / "manifest.json", store_dir / "identity_merges.csv"):
+        parts.append(f"{path.stat().st_mtime_ns}:{path.stat().st_size}" if path.is_file() else "")
+    return "|".join(parts)
+
+
+def _write_region(folder: Path, prices: pd.DataFrame, n_products: int, canonical: dict):
+    folder.mkdir(parents=True)
+    # Renamed products are filed under their canonical id; on a day both names
+    # were listed, the newer name's row wins
+    prices = prices.assign(source_id=prices["product_id"],
+                           product_id=prices["product_id"].map(lambda p: canonical.get(p, p)))
+    prices = prices.sort_values(["product_id", "date", "source_id"], kind="mergesort")
+    prices = prices.drop_duplicates(["product_id", "date"], keep="last")
+    product_id = prices["product_id"].to_numpy(dtype=np.int32)
+    weights, weight_id = np.unique(prices["weight"].fillna("").astype(str).to_numpy(), return_inverse=True)
+
+    np.save(folder / "product_id.npy", product_id)
+    np.save(folder / "day.npy", pd.to_datetime(prices["date"]).to_numpy().astype("datetime64[D]").astype(np.int32))
+    np.save(folder / "price_cents.npy", np.rint(prices["price"].to_numpy(dtype=float) * 100).astype(np.int32))
+    np.save(folder / "weight_id.npy", weight_id.astype(np.int32))
+    # Product ids are dense (0..n-1), so offsets is indexed directly by id
+    np.save(folder / "offsets.npy", np.searchsorted(product_id, np.arange(n_products + 1)).astype(np.int64))
+    with (folder / "weights.json").open("w", encoding="utf-8") as f:
+        json.dump(weights.tolist(), f)
+
+
+def build_history(store_dir: Path = STORE_DIR) -> Path:
+    """Write a new build of the arrays from the store, make it current, and return its folder."""
+    store_dir = Path(store_dir)
+    root = store_dir / "history"
+    stamp = _manifest_stamp(store_dir)
+    build = root / f"{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}_{time.time_ns() % 10**6}"
+
+    products = load_products(store_dir)
+    n_products = int(products["product_id"].max()) + 1 if len(products) else 0
+    prices = load_prices(store_dir)
+    canonical = canonical_ids(store_dir)
+    for region, rows in prices.groupby("region", sort=True):
+        _write_region(build / str(region), rows, n_products, canonical)
+    build.mkdir(parents=True, exist_ok=True)
+
+    tmp = root / f"current.{os.getpid()}.tmp"
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump({"build": build.name, "manifest": stamp, "rows": len(prices), "products": n_products}, f)
+    os.replace(tmp, root / "current.json")
+
+    # Older builds can go; a reader that still maps one keeps it alive on POSIX,
+    # and on Windows the delete fails and is retried next build
+    for old in root.iterdir():
+        if old.is_dir() and old.name != build.name:
+            shutil.rmtree(old, ignore_errors=True)
+    return build
+
+
+class HistoryArrays:
+    """One build's arrays, memory-mapped read-only, plus a (brand, name) -> product_id lookup."""
+
+    def __init__(self, build: Path, store_dir: Path):
+        self.build = build
+        self.regions = {}
+        for folder in sorted(p for p in build.iterdir() if p.is_dir()):
+            arrays = {name: np.load(folder / f"{name}.npy", mmap_mode="r")
+                      for name in ("product_id", "day", "price_cents", "weight_id", "offsets")}
+            with (folder / "weights.json").open("r", encoding="utf-8") as f:
+                arrays["weights"] = json.load(f)
+            self.regions[folder.name] = arrays
+        products = load_products(store_dir)
+        canonical = canonical_ids(store_dir)
+        self.ids = {
+            key: canonical.get(pid, pid)
+            for key, pid in zip(zip(products["brand"], products["name"]), products["product_id"].astype(int))
+        }
+
+    def product_id(self, brand: str, name: str):
+        """Canonical product_id for (brand, name), or None if the store doesn't know it."""
+        return self.ids.get((brand, name))
+
+    def slice(self, product_id: int, region: str = DEFAULT_REGION, start=None, end=None):
+        """
+        (day, price_cents, weight_id) views for one product, limited to the
+        inclusive start/end dates if given; empty views if it has no rows.
+        """
+        a = self.regions.get(region)
+        if a is None or product_id is None or not 0 <= product_id < len(a["offsets"]) - 1:
+            return np.empty(0, np.int32), np.empty(0, np.int32), np.empty(0, np.int32)
+        lo, hi = int(a["offsets"][product_id]), int(a["offsets"][product_id + 1])
+        # A product's days are sorted, so the date bounds are two binary searches
+        days = a["day"][lo:hi]
+        if start is not None:
+            lo += int(np.searchsorted(days, _day_number(start), side="left"))
+        if end is not None:
+            hi = int(a["offsets"][product_id]) + int(np.searchsorted(days, _day_number(end), side="right"))
+        hi = max(lo, hi)
+        return a["day"][lo:hi], a["price_cents"][lo:hi], a["weight_id"][lo:hi]
+
+    def frame(self, product_id: int, region: str = DEFAULT_REGION, start=None, end=None) -> pd.DataFrame:
+        """date / price / weight DataFrame for one product (the same columns get_prices returns)."""
+        day, cents, weight_id = self.slice(product_id, region, start, end)
+        weights = self.regions[region]["weights"] if region in self.regions else []
+        return pd.DataFrame({
+            "date": pd.to_datetime(day.astype("datetime64[D]")).date,
+            "price": cents / 100.0,
+            "weight": [weights[i] for i in weight_id],
+        })
+
+
+def open_history(store_dir: Path = STORE_DIR, build_missing: bool = True):
+    """
+    The process-wide HistoryArrays for the store's current build, rebuilt first
+    if the manifest changed since. Returns None when there is no store (or no
+    build and build_missing is False).
+    """
+    store_dir = Path(store_dir)
+    if not load_manifest(store_dir)["days"]:
+        return None
+    with _lock:
+        try:
+            with (store_dir / "history" / "current.json").open("r", encoding="utf-8") as f:
+                current = json.load(f)
+        except (OSError, ValueError):
+            current = None
+        if current is None or current["manifest"] != _manifest_stamp(store_dir):
+            if not build_missing:
+                return None
+            build = build_history(store_dir)
+        else:
+            build = store_dir / "history" / current["build"]
+
+        key = (str(store_dir), build.name)
+        if key not in _open:
+            _open.clear()
+            _open[key] = HistoryArrays(build, store_dir)
+        return _open[key]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build memory-mapped history arrays from the store.")
+    parser.add_argument("--store", default=str(STORE_DIR))
+    args = parser.parse_args()
+    build = build_history(Path(args.store))
+    with (Path(args.store) / "history" / "current.json").open("r", encoding="utf-8") as f:
+        current = json.load(f)
+    print(f"Built {build} ({current['rows']} rows, {current['products']} products).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+# identity.py
+"""
+Link renamed products (e.g. "Kettle Chips, 8 oz" -> "Kettle Chips 8oz") into
+one stable product ID.
+
+The store gives every distinct (brand, name) its own product_id. This stage
+finds new product IDs that are a renamed version of an older product and
+records each link in a reviewable merge table:
+
+    store/identity_merges.csv
+        product_id, canonical_id, brand, name, canonical_name, score, status, found
+
+status is "auto" (score >= AUTO_SCORE) or "pending" (score >= REVIEW_SCORE).
+A reviewer can change it to "accepted" or "rejected". Rows already in the
+table are never rescored, so review decisions survive reruns. canonical_ids()
+resolves auto and accepted links, following chains of renames, to the
+oldest product_id.
+
+No name is compared with every other name. Candidates come from blocking:
+- an inverted index over rare word tokens and character trigrams of the
+  normalized name
+- the same brand
+- a matching size ("8 oz" vs "16 oz" are different products)
+- the old product stopped being listed before the new one appeared
+- no conflicting numbers, and no swapped word that isn't a typo
+  ("Blueberry" vs "Strawberry" is a different product)
+
+Only the top MAX_CANDIDATES by shared trigrams are scored (trigram Jaccard).
+
+Runs incrementally: only product IDs added since the last run (recorded in
+store/identity_state.json) are looked up.
+
+Usage:
+    python identity.py [--store store] [--full]
+"""
+import os
+import re
+import json
+import argparse
+from pathlib import Path
+from datetime import date
+from collections import Counter
+
+import pandas as pd
+
+from compact_data import STORE_DIR, load_products
+
+AUTO_SCORE = 0.9
+REVIEW_SCORE = 0.75
+MAX_CANDIDATES = 20
+# Tokens/trigrams shared by more products than this don't narrow anything down
+MAX_BLOCK = 200
+
+MERGE_COLS = ["product_id", "canonical_id", "brand", "name", "canonical_name", "score", "status", "found"]
+LINKED = ("auto", "accepted")
+
+_UNITS = r"(oz|fl oz|lb|lbs|ct|count|pk|pack|g|kg|ml|l|qt|gal|pt|in)"
+_SIZE = re.compile(rf"(\d+(?:\.\d+)?)\s*-?\s*{_UNITS}\b")
+
+
+def normalize_name(name: str) -> str:
+    """Lower case, '&' -> and, '8oz' -> '8 oz', punctuation and extra spaces removed."""
+    text = str(name).lower().replace("&", " and ")
+    text = _SIZE.sub(lambda m: f" {m.group(1)} {m.group(2).replace('lbs', 'lb').replace('count', 'ct')} ", text)
+    text = re.sub(r"[^a-z0-9.]+", " ", text)
+    text = re.sub(r"(?<!\d)\.|\.(?!\d)", " ", text)
+    return " ".join(text.split())
+
+
+def size_of(normalized: str):
+    """Sizes mentioned in a normalized name, e.g. ('12 oz',); empty if none."""
+    return tuple(sorted(f"{float(n):g} {u}" for n, u in _SIZE.findall(normalized)))
+
+
+def trigrams(normalized: str) -> frozenset:
+    padded = f"  {normalized} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _edit_distance(a: str, b: str) -> int:
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return prev[-1]
+
+
+def compatible(norm_a: str, norm_b: str) -> bool:
+    """
+    False when the names differ in a way a rename doesn't: conflicting numbers
+    ("5 inch" vs "10 inch") or a swapped word that isn't a typo ("Blueberry"
+    vs "Strawberry"). Added or dropped words, reordering and one-letter
+    fixes ("Gummi" -> "Gummy") are fine.
+    """
+    a, b = set(norm_a.split()), set(norm_b.split())
+    only_a, only_b = a - b, b - a
+    num_a = {t for t in only_a if t[0].isdigit()}
+    num_b = {t for t in only_b if t[0].isdigit()}
+    if num_a and num_b:
+        return False
+    words_a, words_b = only_a - num_a, only_b - num_b
+    if not words_a or not words_b:
+        return True
+    fewer, more = sorted((words_a, words_b), key=len)
+    return all(
+        any(_edit_distance(w, o) <= (2 if min(len(w), len(o)) >= 8 else 1) for o in more)
+        for w in fewer
+    )
+
+
+def similarity(a: frozenset, b: frozenset) -> float:
+    """Jaccard similarity of two trigram sets."""
+    if not a or not b:
+        return 0.0
+    inter = len(a & b)
+    return inter / (len(a) + len(b) - inter)
+
+
+class BlockingIndex:
+    """Inverted index from (brand, token/trigram) to product ids, for candidate lookup."""
+
+    def __init__(self, products: pd.DataFrame):
+        self.info = {}
+        self.postings = {}
+        for r in products.itertuples(index=False):
+            norm = normalize_name(r.name)
+            grams = trigrams(norm)
+            pid = int(r.product_id)
+            self.info[pid] = (r.brand, norm, grams, size_of(norm), r.first_date, r.last_date, r.name)
+            for key in set(norm.split()) | grams:
+                self.postings.setdefault((r.brand, key), []).append(pid)
+
+    def candidates(self, pid: int):
+        """Up to MAX_CANDIDATES (other_id, shared_keys) for pid, most shared first."""
+        brand, norm, grams, _, _, _, _ = self.info[pid]
+        shared = Counter()
+        for key in set(norm.split()) | grams:
+            block = self.postings.get((brand, key), ())
+            if len(block) <= MAX_BLOCK:
+                shared.update(block)
+        shared.pop(pid, None)
+        return shared.most_common(MAX_CANDIDATES)
+
+    def best_match(self, pid: int):
+        """(older_id, score) of the best rename candidate for pid, or None."""
+        _, norm, grams, size, first, _, _ = self.info[pid]
+        best = None
+        for other, _ in self.candidates(pid):
+            _, o_norm, o_grams, o_size, _, o_last, _ = self.info[other]
+            # A rename replaces the old listing: the old name is gone by the time the new one shows up
+            if other > pid or o_last > first or (size and o_size and size != o_size):
+                continue
+            if not compatible(norm, o_norm):
+                continue
+            score = similarity(grams, o_grams)
+            if score >= REVIEW_SCORE and (best is None or score > best[1]):
+                best = (other, score)
+        return best
+
+
+def load_merges(store_dir: Path = STORE_DIR) -> pd.DataFrame:
+    path = Path(store_dir) / "identity_merges.csv"
+    if not path.is_file():
+        return pd.DataFrame(columns=MERGE_COLS)
+    return pd.read_csv(path, dtype={"brand": str, "name": str, "canonical_name": str}, keep_default_na=False)
+
+
+def canonical_ids(store_dir: Path = STORE_DIR) -> dict:
+    """{product_id: canonical product_id} for every linked (auto or accepted) rename."""
+    merges = load_merges(store_dir)
+    links = dict(zip(merges.loc[merges["status"].isin(LINKED), "product_id"].astype(int),
+                     merges.loc[merges["status"].isin(LINKED), "canonical_id"].astype(int)))
+    out = {}
+    for pid in links:
+        root, seen = pid, set()
+        while root in links and root not in seen:
+            seen.add(root)
+            root = links[root]
+        out[pid] = root
+    return out
+
+
+def resolve_identities(store_dir: Path = STORE_DIR, full: bool = False, today=None) -> pd.DataFrame:
+    """
+    Look up rename candidates for products added since the last run (every
+    product with full=True) and append them to the merge table. Existing
+    rows, and the decisions recorded in them, are kept. Returns the new rows.
+    """
+    store_dir = Path(store_dir)
+    state_path = store_dir / "identity_state.json"
+    try:
+        with state_path.open("r", encoding="utf-8") as f:
+            checked_through = -1 if full else json.load(f)["checked_through"]
+    except (OSError, ValueError, KeyError):
+        checked_through = -1
+
+    products = load_products(store_dir)
+    merges = load_merges(store_dir)
+    if products.empty:
+        return pd.DataFrame(columns=MERGE_COLS)
+
+    index = BlockingIndex(products)
+    known = set(merges["product_id"].astype(int))
+    found = (today or date.today()).isoformat()
+    new_rows = []
+    for pid in sorted(p for p in index.info if p > checked_through and p not in known):
+        match = index.best_match(pid)
+        if match is None:
+            continue
+        other, score = match
+        brand, _, _, _, _, _, name = index.info[pid]
+        new_rows.append({
+            "product_id": pid,
+            "canonical_id": other,
+            "brand": brand,
+            "name": name,
+            "canonical_name": index.info[other][6],
+            "score": round(score, 3),
+            "status": "auto" if score >= AUTO_SCORE else "pending",
+            "found": found,
+        })
+
+    new = pd.DataFrame(new_rows, columns=MERGE_COLS)
+    if len(new):
+        merges = pd.concat([merges, new], ignore_index=True).sort_values("product_id", kind="mergesort")
+        tmp = store_dir / "identity_merges.csv.tmp"
+        merges.to_csv(tmp, index=False)
+        os.replace(tmp, store_dir / "identity_merges.csv")
+
+    tmp = state_path.with_suffix(".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump({"checked_through": int(products["product_id"].max())}, f)
+    os.replace(tmp, state_path)
+
+    print(f"{len(new)} new rename link(s) ({(new['status'] == 'auto').sum()} auto, "
+          f"{(new['status'] == 'pending').sum()} for review) -> {store_dir / 'identity_merges.csv'}")
+    return new
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Link renamed products into stable product IDs.")
+    parser.add_argument("--store", default=str(STORE_DIR))
+    parser.add_argument("--full", action="store_true", help="look at every product, not only new ones")
+    args = parser.parse_args()
+    new = resolve_identities(Path(args.store), full=args.full)
+    if len(new):
+        print(new[["product_id", "canonical_id", "score", "status", "canonical_name", "name"]].to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+# instrumentation.py
+"""
+Stage-level timing, counters and peak memory for the daily job.
+
+    from instrumentation import start_run, stage, count, finish_run
+
+    start_run(log_dir)
+    with stage("scrape.category", category="snacks"):
+        ...
+        count("tiles", len(items))
+    finish_run()
+
+Every finished stage is written as one JSON line to
+log_dir/run_<run_id>.jsonl. Stages nest, and counters go to the innermost
+open stage and to the run totals.
+
+Memory: every stage records the process max RSS (a high-water mark, so it
+never goes down). Per-stage Python peaks come from tracemalloc, which slows
+allocation-heavy code by up to ~10x, so it is opt-in: ALDI_TRACE_MEMORY=1 or
+start_run(..., trace_memory=True). tracemalloc covers the whole process, so
+overlapping async stages share one peak.
+
+Profiling: set ALDI_PROFILE to a comma-separated list of stage names (or *)
+and ALDI_PROFILER to "cprofile" (default) or "pyinstrument". Each matching
+stage writes a .prof / .html file next to the run log.
+
+When no run is started, stage() and count() only keep the bookkeeping and
+write nothing, so library code can stay instrumented unconditionally.
+
+Compare two runs for regressions:
+    python instrumentation.py logs/run_A.jsonl logs/run_B.jsonl [--factor 3]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import fnmatch
+import tracemalloc
+import contextvars
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+from pathlib import Path
+from datetime import datetime
+from contextlib import contextmanager
+
+_run = None
+_started_tracing = False
+_stack = contextvars.ContextVar("instrumentation_stack", default=())
+
+
+class Run:
+    def __init__(self, log_dir, run_id=None):
+        self.run_id = run_id or datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.log_dir = Path(log_dir)
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        self.path = self.log_dir / f"run_{self.run_id}.jsonl"
+        self.counters = {}
+        self.started = time.perf_counter()
+        self.profile_stages = [s for s in os.environ.get("ALDI_PROFILE", "").split(",") if s]
+        self.profiler = os.environ.get("ALDI_PROFILER", "cprofile")
+        self._file = self.path.open("a", encoding="utf-8")
+
+    def emit(self, record: dict):
+        record = {"run_id": self.run_id, "ts": datetime.now().isoformat(timespec="milliseconds"), **record}
+        self._file.write(json.dumps(record, default=str) + "\n")
+        self._file.flush()
+
+    def wants_profile(self, name: str) -> bool:
+        return any(fnmatch.fnmatchcase(name, pat) for pat in self.profile_stages)
+
+    def close(self):
+        self._file.close()
+
+
+class _Stage:
+    __slots__ = ("name", "fields", "counters", "peak")
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+        self.counters = {}
+        self.peak = 0
+
+
+def max_rss_bytes():
+    """Process resident-set high-water mark, or None where unavailable."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def start_run(log_dir, run_id=None, trace_memory=None) -> Run:
+    """
+    Start recording; stages finished from now on are written to the run's
+    JSONL file. trace_memory defaults to the ALDI_TRACE_MEMORY env var.
+    """
+    global _run, _started_tracing
+    if _run is not None:
+        finish_run()
+    if trace_memory is None:
+        trace_memory = os.environ.get("ALDI_TRACE_MEMORY") == "1"
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _started_tracing = True
+    _run = Run(log_dir, run_id)
+    _run.emit({"event": "run_start", "argv": sys.argv, "pid": os.getpid()})
+    return _run
+
+
+def finish_run():
+    """Write the run summary (total time, counters, peak memory) and close the log."""
+    global _run, _started_tracing
+    if _run is None:
+        return
+    tracing = tracemalloc.is_tracing()
+    _run.emit({
+        "event": "run_end",
+        "duration_s": round(time.perf_counter() - _run.started, 4),
+        "peak_mem_bytes": tracemalloc.get_traced_memory()[1] if tracing else None,
+        "max_rss_bytes": max_rss_bytes(),
+        "counters": _run.counters,
+    })
+    _run.close()
+    print(f"Run log written to {_run.path}")
+    _run = None
+    if _started_tracing:
+        tracemalloc.stop()
+        _started_tracing = False
+
+
+def count(name: str, n=1):
+    """Add n to counter name on the innermost open stage and on the run totals."""
+    stack = _stack.get()
+    if stack:
+        c = stack[-1].counters
+        c[name] = c.get(name, 0) + n
+    if _run is not None:
+        _run.counters[name] = _run.counters.get(name, 0) + n
+
+
+@contextmanager
+def _profiled(name):
+    if _run is None or not _run.wants_profile(name):
+        yield
+        return
+    safe = name.replace("/", "_").replace(" ", "_")
+    if _run.profiler == "pyinstrument":
+        from pyinstrument import Profiler
+        prof = Profiler(async_mode="enabled")
+        prof.start()
+        try:
+            yield
+        finally:
+            prof.stop()
+            out = _run.log_dir / f"run_{_run.run_id}_{safe}_{time.time_ns()}.html"
+            out.write_text(prof.output_html(), encoding="utf-8")
+    else:
+        import cProfile
+        prof = cProfile.Profile()
+        prof.enable()
+        try:
+            yield
+        finally:
+            prof.disable()
+            prof.dump_stats(_run.log_dir / f"run_{_run.run_id}_{safe}_{time.time_ns()}.prof")
+
+
+@contextmanager
+def stage(name: str, **fields):
+    """
+    Time a block of work. Extra keyword fields (category, page, ...) are
+    recorded with the stage so repeated stages can be told apart.
+    """
+    st = _Stage(name, fields)
+    parent_stack = _stack.get()
+    token = _stack.set(parent_stack + (st,))
+
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        # Remember the peak seen so far, then measure this stage from a clean slate
+        outer_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.reset_peak()
+
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        with _profiled(name):
+            yield st
+    except BaseException as e:
+        status = f"error: {type(e).__name__}"
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        _stack.reset(token)
+        if tracing:
+            st.peak = max(st.peak, tracemalloc.get_traced_memory()[1])
+            if parent_stack:
+                parent_stack[-1].peak = max(parent_stack[-1].peak, st.peak, outer_peak)
+        if _run is not None:
+            _run.emit({
+                "event": "stage",
+                "stage": name,
+                "parent": parent_stack[-1].name if parent_stack else None,
+                **fields,
+                "status": status,
+                "duration_s": round(duration, 4),
+                "peak_mem_bytes": st.peak if tracing else None,
+                "max_rss_bytes": max_rss_bytes(),
+                "counters": st.counters,
+            })
+
+
+def summarize(path) -> dict:
+    """Total duration and call count per (stage, fields) key from one run log."""
+    out = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            rec = json.loads(line)
+            if rec.get("event") != "stage":
+                continue
+            extra = {k: v for k, v in rec.items() if k not in (
+                "run_id", "ts", "event", "stage", "parent", "status", "duration_s", "peak_mem_bytes",
+                "max_rss_bytes", "counters", "page")}
+            key = rec["stage"] + "".join(f" {k}={v}" for k, v in sorted(extra.items()))
+            agg = out.setdefault(key, {"duration_s": 0.0, "calls": 0, "peak_mem_bytes": 0})
+            agg["duration_s"] += rec["duration_s"]
+            agg["calls"] += 1
+            agg["peak_mem_bytes"] = max(agg["peak_mem_bytes"], rec.get("peak_mem_bytes") or 0)
+    return out
+
+
+def compare(old_path, new_path, factor=3.0):
+    """Print per-stage durations for two runs and flag stages that got factor× slower."""
+    old, new = summarize(old_path), summarize(new_path)
+    flagged = []
+    print(f"{'stage':<60}{'old s':>10}{'new s':>10}{'ratio':>8}")
+    for key in sorted(set(old) | set(new)):
+        o = old.get(key, {}).get("duration_s")
+        n = new.get(key, {}).get("duration_s")
+        ratio = n / o if o and n is not None else None
+        mark = ""
+        if ratio is not None and ratio >= factor:
+            mark = "  <-- regression"
+            flagged.append(key)
+        o_s = f"{o:10.2f}" if o is not None else f"{'-':>10}"
+        n_s = f"{n:10.2f}" if n is not None else f"{'-':>10}"
+        r_s = f"{ratio:8.1f}" if ratio is not None else f"{'-':>8}"
+        print(f"{key:<60}{o_s}{n_s}{r_s}{mark}")
+    return flagged
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two run logs and flag slow stages.")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--factor", type=float, default=3.0)
+    args = parser.parse_args()
+    flagged = compare(args.old, args.new, args.factor)
+    if flagged:
+        raise SystemExit(f"{len(flagged)} stage(s) slowed down {args.factor:g}x or more.")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,38 +2,59 @@
 import asyncio
 from aldi import scrape_aldi_data
 from concat_data import concat_data, get_anomalies
-import subprocess
+from compact_data import compact
+from co_movement import find_comovement
+from history_arrays import build_history
+from identity import resolve_identities
+from movers_feed import build_movers_feed
+from instrumentation import finish_run, stage, start_run
+from publish import publish
+from streaming import stream_day
 from pathlib import Path
-from datetime import date
-def git_commit_and_push():
-    repo_dir = Path(r"C:\Users\cools\grocery\aldi")
 
-    # Stage everything
-    subprocess.run(["git", "add", "."], cwd=repo_dir, check=True)
 
-    # Commit with today's date
-    msg = f"Auto-update Aldi data {date.today().isoformat()}"
-    # If there are no changes, this will fail; we can ignore that
+def main(streaming: bool = True, base_dir: str = r"C:\Users\cools\grocery\aldi\data"):
+    store_dir = Path(base_dir).parent / "store"
+    print("Started Aldi…")
+    # Per-stage timings/counters/peak memory go to logs/run_<timestamp>.jsonl
+    start_run(Path(base_dir).parent / "logs")
     try:
-        subprocess.run(["git", "commit", "-m", msg], cwd=repo_dir, check=True)
-    except subprocess.CalledProcessError:
-        print("No changes to commit.")
-        return
-
-    # Push to origin/main
-    subprocess.run(["git", "push", "origin", "main"], cwd=repo_dir, check=True)
+        if streaming:
+            # Each finished category is compacted and scored while the rest are scraped
+            with stage("stream"):
+                anomalies = asyncio.run(stream_day(base_dir, store_dir))
+        else:
+            with stage("scrape"):
+                asyncio.run(scrape_aldi_data(base_dir))
 
-    
-def main():
-    base_dir = r"C:\Users\cools\grocery\aldi\data"
-    print("Started Aldi…")
-    asyncio.run(scrape_aldi_data(base_dir))
+        with stage("compact"):
+            if not streaming:
+                # Fold the new day into the compacted store (only new/changed days are read);
+                # streaming mode already upserted today's categories as they finished
+                compact(Path(base_dir), store_dir)
+            # Link today's new names to renamed products before histories are built
+            resolve_identities(store_dir)
+            # Memory-mapped per-product histories the dashboard slices into
+            build_history(store_dir)
 
-    concat_data()
-    get_anomalies()
+        if not streaming:
+            # The combined CSV only feeds get_anomalies; the dashboard reads the store without it
+            with stage("concat"):
+                concat_data(base_dir)
+            with stage("anomalies"):
+                anomalies = get_anomalies(base_dir, incremental=True)
+        # Sorted, capped deal/hike cards with sparklines: the dashboard's one read
+        with stage("movers_feed"):
+            build_movers_feed(base_dir, store_dir, anomalies=anomalies)
+        # Same-day repricing across brands/categories, from the store
+        with stage("comovement"):
+            find_comovement(store_dir, base_dir)
 
-    # New: commit & push
-    git_commit_and_push()
+        # Commit & push only the store and the day's anomalies (bytes are logged per day)
+        with stage("publish"):
+            publish(Path(base_dir).parent, Path(base_dir), store_dir)
+    finally:
+        finish_run()
 
 
 
@@ -0,0 +1,146 @@
+# movers_feed.py
+"""
+Materialized "price movers" view for the dashboard.
+
+Built from the day's price_anomalies CSV and the compacted store:
+
+    data/YYYYMMDD/movers_YYYYMMDD.json
+    {
+      "version": 1, "date": "2025-12-06", "max_cards": 30, "sparkline_days": 30,
+      "regions": {
+        "default": {
+          "deals": [card, ...],   pct_diff_vs_30d_median < 0, most negative first
+          "hikes": [card, ...]    pct_diff_vs_30d_median > 0, largest first
+        }
+      }
+    }
+
+    card = {brand, name, weight, latest_date, latest_price, median_price_30d,
+            pct_diff_vs_30d_median, direction, reason,
+            spark: {dates: [...], prices: [...]}}
+
+Numbers are already floats, lists are already sorted and capped, and each
+card carries its last sparkline_days of prices. The movers panel renders
+from this one small file. It never re-cleans the anomalies CSV and never
+scans history for each card.
+
+Usage:
+    python movers_feed.py [--data data] [--store store] [--today YYYY-MM-DD]
+"""
+import os
+import json
+import argparse
+from pathlib import Path
+from datetime import date, timedelta
+
+import pandas as pd
+
+from compact_data import DATA_DIR, STORE_DIR, load_prices, load_products
+
+FEED_VERSION = 1
+MAX_CARDS = 30
+SPARKLINE_DAYS = 30
+MISSING_BRAND = "(no brand)"
+
+CARD_COLS = [
+    "brand", "name", "weight", "latest_date", "latest_price", "median_price_30d",
+    "pct_diff_vs_30d_median", "direction", "reason",
+]
+
+
+def _clean_anomalies(anoms: pd.DataFrame) -> pd.DataFrame:
+    """Typed copy of the anomalies table (the CSV may carry '$' / '%' from older runs)."""
+    anoms = anoms.copy()
+    if "region" not in anoms.columns:
+        anoms["region"] = "default"
+    for col in ("latest_price", "median_price_30d", "pct_diff_vs_30d_median"):
+        anoms[col] = pd.to_numeric(
+            anoms[col].astype(str).str.replace(r"[$,%]", "", regex=True), errors="coerce"
+        )
+    for col in ("brand", "name", "weight", "direction", "reason"):
+        anoms[col] = anoms[col].fillna("").astype(str) if col in anoms.columns else ""
+    anoms["latest_date"] = pd.to_datetime(anoms["latest_date"]).dt.strftime("%Y-%m-%d")
+    return anoms.dropna(subset=["latest_price", "pct_diff_vs_30d_median"])
+
+
+def pick_movers(anoms: pd.DataFrame, max_cards: int = MAX_CARDS):
+    """(deals, hikes) for one region: sorted the way the cards show them and capped."""
+    deals = anoms[anoms["pct_diff_vs_30d_median"] < 0].sort_values(
+        "pct_diff_vs_30d_median", kind="mergesort").head(max_cards)
+    hikes = anoms[anoms["pct_diff_vs_30d_median"] > 0].sort_values(
+        "pct_diff_vs_30d_median", ascending=False, kind="mergesort").head(max_cards)
+    return deals, hikes
+
+
+def sparklines(cards: pd.DataFrame, region: str, store_dir: Path, end: date, days: int) -> list:
+    """{dates, prices} of the last `days` days for each card, in card order."""
+    products = load_products(store_dir)
+    ids = products.set_index(["brand", "name"])["product_id"]
+    keys = pd.MultiIndex.from_arrays([cards["brand"].replace(MISSING_BRAND, ""), cards["name"]])
+    card_ids = ids.reindex(keys).to_numpy()
+
+    wanted = [int(i) for i in card_ids if pd.notna(i)]
+    history = load_prices(store_dir, end - timedelta(days=days), end, product_ids=wanted, region=region) \
+        if wanted else pd.DataFrame(columns=["product_id", "date", "price"])
+    history = history.sort_values(["product_id", "date"], kind="mergesort")
+    by_id = {
+        pid: {"dates": pd.to_datetime(g["date"]).dt.strftime("%Y-%m-%d").tolist(), "prices": g["price"].round(2).tolist()}
+        for pid, g in history.groupby("product_id", sort=False)
+    }
+    empty = {"dates": [], "prices": []}
+    return [by_id.get(int(i), empty) if pd.notna(i) else empty for i in card_ids]
+
+
+def build_movers_feed(base_dir=DATA_DIR, store_dir=STORE_DIR, today=None, anomalies=None,
+                      max_cards=MAX_CARDS, spark_days=SPARKLINE_DAYS) -> str:
+    """
+    Write base_dir/<today>/movers_<today>.json from the day's anomalies (the
+    DataFrame get_anomalies returned, or its CSV) and return the path.
+    """
+    today = today or date.today()
+    today_str = today.strftime("%Y%m%d")
+    folder = os.path.join(base_dir, today_str)
+    if anomalies is None:
+        csv_path = os.path.join(folder, f"price_anomalies_{today_str}.csv")
+        anomalies = pd.read_csv(csv_path) if os.path.isfile(csv_path) else pd.DataFrame(columns=CARD_COLS)
+
+    regions = {}
+    if len(anomalies):
+        anoms = _clean_anomalies(anomalies)
+        for region, rows in anoms.groupby("region", sort=True):
+            lists = {}
+            for kind, cards in zip(("deals", "hikes"), pick_movers(rows, max_cards)):
+                records = cards[CARD_COLS].to_dict("records")
+                for rec, spark in zip(records, sparklines(cards, region, Path(store_dir), today, spark_days)):
+                    rec["spark"] = spark
+                lists[kind] = records
+            regions[str(region)] = lists
+
+    feed = {
+        "version": FEED_VERSION,
+        "date": today.isoformat(),
+        "max_cards": max_cards,
+        "sparkline_days": spark_days,
+        "regions": regions,
+    }
+    os.makedirs(folder, exist_ok=True)
+    out_path = os.path.join(folder, f"movers_{today_str}.json")
+    tmp = out_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(feed, f, separators=(",", ":"))
+    os.replace(tmp, out_path)
+    print(f"Movers feed saved to {out_path}")
+    return out_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write the dashboard's movers feed for a day.")
+    parser.add_argument("--data", default=str(DATA_DIR))
+    parser.add_argument("--store", default=str(STORE_DIR))
+    parser.add_argument("--today", type=date.fromisoformat, default=None)
+    args = parser.parse_args()
+    build_movers_feed(args.data, args.store, args.today)
+
+
+if __name__ == "__main__":
+    main()
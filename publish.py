@@ -0,0 +1,157 @@
+# publish.py
+"""
+Commit and push one day's data while keeping the repo small.
+
+Only compact artifacts are staged:
+
+    store/manifest.json, store/products.csv    small metadata
+    store/identity_merges.csv                  product rename links, for review
+    store/prices/*.parquet                     new or changed day partitions
+    data/YYYYMMDD/price_anomalies_*.csv        small derived outputs; the dashboard
+    data/YYYYMMDD/comovement_*.csv             reads the anomalies and movers feed
+    data/YYYYMMDD/movers_*.json
+
+Raw scrape CSVs and combined_* files stay local (they are git-ignored). The
+store partitions carry every product's daily price. combined_* is rebuilt
+by concat_data each run, and the dashboard reads the store when the file is
+absent. The commit is limited to these paths, so anything else staged by
+hand is left alone.
+
+Each run prints the bytes committed per file and day, and records them as
+the publish stage's counters in the run log (bytes_committed,
+files_committed), so repo growth can be tracked from day to day.
+
+The store is the only published copy of each day's prices, so publishing
+never removes a partition: files missing locally are not staged as
+deletions, and a run is refused if a partition deletion is already staged
+(commit an intended `compact_data.py --prune` by hand).
+
+Usage:
+    python publish.py [--day YYYYMMDD] [--no-push]
+"""
+import argparse
+import subprocess
+from pathlib import Path
+from datetime import date, datetime
+from instrumentation import count
+
+REPO_DIR = Path(__file__).resolve().parent
+DATA_DIR = REPO_DIR / "data"
+STORE_DIR = REPO_DIR / "store"
+
+
+def _git(repo_dir: Path, *args):
+    subprocess.run(["git", *args], cwd=repo_dir, check=True)
+
+
+def publish_paths(repo_dir: Path, data_dir: Path, store_dir: Path, day: date):
+    """Repo-relative paths to stage for day; missing files are left out."""
+    day_str = day.strftime("%Y%m%d")
+    candidates = [
+        store_dir / "manifest.json",
+        store_dir / "products.csv",
+        store_dir / "identity_merges.csv",
+        store_dir / "prices",
+        data_dir / day_str / f"price_anomalies_{day_str}.csv",
+        data_dir / day_str / f"comovement_{day_str}.csv",
+        data_dir / day_str / f"movers_{day_str}.json",
+    ]
+    return [p.relative_to(repo_dir).as_posix() for p in candidates if p.exists()]
+
+
+class PublishError(RuntimeError):
+    """The staged changes would remove published history."""
+
+
+def removed_partitions(repo_dir: Path, store_dir: Path):
+    """Staged deletions under store/prices (repo-relative paths)."""
+    prices = (store_dir / "prices").relative_to(repo_dir).as_posix()
+    names = subprocess.run(
+        ["git", "diff", "--cached", "--name-only", "--diff-filter=D", "-z", "--", prices],
+        cwd=repo_dir, check=True, capture_output=True, text=True,
+    ).stdout.split("\0")
+    return [n for n in names if n]
+
+
+def staged_sizes(repo_dir: Path, paths):
+    """{path: bytes} for every staged change under paths (0 for deletions)."""
+    names = subprocess.run(
+        ["git", "diff", "--cached", "--name-only", "-z", "--", *paths],
+        cwd=repo_dir, check=True, capture_output=True, text=True,
+    ).stdout.split("\0")
+    sizes = {}
+    for name in filter(None, names):
+        f = repo_dir / name
+        sizes[name] = f.stat().st_size if f.is_file() else 0
+    return sizes
+
+
+def report(sizes: dict):
+    """Print bytes committed per file, grouped by the day each file belongs to."""
+    by_day = {}
+    for name, size in sorted(sizes.items()):
+        stem = Path(name).stem
+        # prices/YYYYMMDD.parquet and data/YYYYMMDD/... carry their day; the rest is store metadata
+        key = next((part for part in (stem, *Path(name).parts) if part.isdigit() and len(part) == 8), "metadata")
+        by_day.setdefault(key, []).append((name, size))
+
+    total = sum(sizes.values())
+    for key, files in sorted(by_day.items()):
+        print(f"{key}: {sum(s for _, s in files):,} bytes")
+        for name, size in files:
+            print(f"    {size:>12,}  {name}")
+    print(f"Committing {len(sizes)} file(s), {total:,} bytes.")
+    count("files_committed", len(sizes))
+    count("bytes_committed", total)
+    return total
+
+
+def publish(repo_dir: Path = REPO_DIR, data_dir: Path = DATA_DIR, store_dir: Path = STORE_DIR,
+            day: date = None, push: bool = True) -> dict:
+    """
+    Stage and commit the day's compact artifacts, then push to origin/main.
+    Returns {path: bytes} of what was committed (empty if nothing changed).
+    """
+    repo_dir, data_dir, store_dir = Path(repo_dir), Path(data_dir), Path(store_dir)
+    day = day or date.today()
+
+    paths = publish_paths(repo_dir, data_dir, store_dir, day)
+    if not paths:
+        print("Nothing to publish.")
+        return {}
+    # New and changed files only; a partition missing locally is never staged as a deletion
+    _git(repo_dir, "add", "--ignore-removal", "--", *paths)
+    removed = removed_partitions(repo_dir, store_dir)
+    if removed:
+        raise PublishError(
+            f"refusing to publish: {len(removed)} price partition(s) staged for deletion "
+            f"({', '.join(removed[:3])}{', ...' if len(removed) > 3 else ''})"
+        )
+
+    sizes = staged_sizes(repo_dir, paths)
+    if not sizes:
+        print("No changes to commit.")
+        return {}
+    report(sizes)
+
+    # Commit with today's date. Name the staged files, not the directories: a
+    # directory pathspec commits its working tree state, deletions included
+    msg = f"Auto-update Aldi data {day.isoformat()}"
+    _git(repo_dir, "commit", "-m", msg, "--", *sizes)
+
+    if push:
+        # Push to origin/main
+        _git(repo_dir, "push", "origin", "main")
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Commit and push the day's compact artifacts.")
+    parser.add_argument("--day", type=lambda s: datetime.strptime(s, "%Y%m%d").date(), default=None)
+    parser.add_argument("--no-push", action="store_true")
+    args = parser.parse_args()
+    publish(day=args.day, push=not args.no_push)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+# query_service.py
+"""
+Local HTTP/JSON query service over the compacted price store.
+
+    python query_service.py [--host 127.0.0.1] [--port 8765] [--store store] [--data data]
+
+Endpoints (all GET, all JSON):
+
+    /search?q=kettle chips&limit=50          products matching every word (same
+                                             rules as the dashboard search box)
+    /history?product_id=12                   one product's daily prices; also
+    /history?brand=CLANCY'S&name=...         accepts brand+name, and optional
+                                             region (default "default"), start,
+                                             end (YYYY-MM-DD, inclusive)
+    /history/batch?ids=12,40,77              several histories in one response
+    /anomalies?region=default&direction=lower
+                                             the newest price_anomalies_*.csv
+                                             (direction: lower or higher)
+    /health                                  data version and sizes
+
+Everything is loaded once into memory: the product list, an inverted token
+index for search, and every price row sorted by (region, product_id, date).
+Each (region, product) maps to its row range, so a history is an array slice
+rather than a scan. The index is rebuilt when store/manifest.json or the
+newest anomalies file changes (checked at most every RELOAD_SECONDS).
+Encoded responses are kept in an LRU cache keyed by data version and
+request. Each connection gets its own thread (ThreadingHTTPServer), and
+readers never block each other.
+"""
+import json
+import time
+import bisect
+import argparse
+import threading
+from pathlib import Path
+from datetime import date
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from compact_data import STORE_DIR, load_manifest, load_prices, load_products
+from search_tokens import normalize_text_to_tokens, query_tokens
+
+DATA_DIR = Path(__file__).resolve().parent / "data"
+
+DEFAULT_REGION = "default"
+RELOAD_SECONDS = 30
+CACHE_ENTRIES = 2048
+MAX_LIMIT = 500
+MAX_BATCH = 200
+
+
+class QueryError(ValueError):
+    """Bad request parameters; reported to the client as HTTP 400."""
+
+
+class NotFound(LookupError):
+    """Unknown product; reported to the client as HTTP 404."""
+
+
+class ResponseCache:
+    """Thread-safe LRU of encoded responses."""
+
+    def __init__(self, max_entries=CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            body = self._items.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key, body):
+        with self._lock:
+            self._items[key] = body
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+
+def data_version(store_dir: Path, data_dir: Path) -> str:
+    """Changes whenever the store is recompacted or a newer anomalies file lands."""
+    manifest = store_dir / "manifest.json"
+    parts = [str(manifest.stat().st_mtime_ns) if manifest.is_file() else "-"]
+    anomalies = latest_anomalies_file(data_dir)
+    if anomalies is not None:
+        parts.append(f"{anomalies.name}:{anomalies.stat().st_mtime_ns}")
+    return "|".join(parts)
+
+
+def latest_anomalies_file(data_dir: Path):
+    files = sorted(Path(data_dir).glob("[0-9]" * 8 + "/price_anomalies_*.csv"))
+    return files[-1] if files else None
+
+
+class PriceIndex:
+    """Read-only, in-memory indexes over one version of the store."""
+
+    def __init__(self, store_dir: Path = STORE_DIR, data_dir: Path = DATA_DIR):
+        self.version = data_version(store_dir, data_dir)
+        self.updated = load_manifest(store_dir).get("updated")
+
+        products = load_products(store_dir)
+        products["display"] = (products["brand"] + " " + products["name"]).str.strip()
+        self.products = {
+            int(r.product_id): {
+                "product_id": int(r.product_id),
+                "brand": r.brand,
+                "name": r.name,
+                "category": r.category,
+                "display": r.display,
+                "first_date": r.first_date,
+                "last_date": r.last_date,
+            }
+            for r in products.itertuples(index=False)
+        }
+        self.by_key = {(p["brand"], p["name"]): pid for pid, p in self.products.items()}
+
+        # Inverted index: token -> product ids, plus the sorted tokens for prefix lookups
+        self.postings = {}
+        for pid, p in self.products.items():
+            for t in normalize_text_to_tokens(p["display"]):
+                self.postings.setdefault(t, set()).add(pid)
+        self.tokens = sorted(self.postings)
+
+        # Every price row, sorted so each (region, product) is one contiguous range
+        prices = load_prices(store_dir).sort_values(["region", "product_id", "date"], kind="mergesort")
+        self.dates = pd.to_datetime(prices["date"]).dt.strftime("%Y-%m-%d").to_numpy()
+        self.prices = prices["price"].to_numpy(dtype=float)
+        self.weights = prices["weight"].fillna("").astype(str).to_numpy()
+        region = prices["region"].to_numpy()
+        pid = prices["product_id"].to_numpy()
+        starts = np.r_[0, np.flatnonzero((region[1:] != region[:-1]) | (pid[1:] != pid[:-1])) + 1]
+        ends = np.r_[starts[1:], len(prices)]
+        self.ranges = {(region[s], int(pid[s])): (int(s), int(e)) for s, e in zip(starts, ends)}
+
+        anomalies_path = latest_anomalies_file(data_dir)
+        self.anomalies_file = anomalies_path.name if anomalies_path else None
+        self.anomalies = []
+        if anomalies_path is not None:
+            anoms = pd.read_csv(anomalies_path)
+            if "region" not in anoms.columns:
+                anoms["region"] = DEFAULT_REGION
+            anoms = anoms.astype(object).where(anoms.notna(), None)
+            self.anomalies = anoms.to_dict("records")
+
+    # ---- search -------------------------------------------------------------
+
+    def _ids_for_query_token(self, q: str) -> set:
+        """Product ids having a token that matches q (exact, or an 80%-overlap prefix for long tokens)."""
+        ids = set(self.postings.get(q, ()))
+        if len(q) < 4:
+            return ids
+        # Longer tokens that start with q: t.startswith(q) and len(q) / len(t) >= 0.8
+        i = bisect.bisect_right(self.tokens, q)
+        while i < len(self.tokens) and self.tokens[i].startswith(q):
+            t = self.tokens[i]
+            if len(q) / len(t) >= 0.8:
+                ids |= self.postings[t]
+            i += 1
+        # Shorter tokens that q starts with: q.startswith(t) and len(t) / len(q) >= 0.8
+        for n in range(max(4, -(-len(q) * 4 // 5)), len(q)):
+            ids |= self.postings.get(q[:n], set())
+        return ids
+
+    def search(self, query: str, limit: int = 50):
+        wanted = query_tokens(query)
+        if not wanted:
+            return []
+        ids = None
+        for q in sorted(wanted, key=len, reverse=True):
+            ids = self._ids_for_query_token(q) if ids is None else ids & self._ids_for_query_token(q)
+            if not ids:
+                return []
+        found = sorted((self.products[i] for i in ids), key=lambda p: p["display"])
+        return found[:limit]
+
+    # ---- history ------------------------------------------------------------
+
+    def resolve(self, product_id=None, brand=None, name=None) -> int:
+        if product_id is not None:
+            if product_id not in self.products:
+                raise NotFound(f"unknown product_id {product_id}")
+            return product_id
+        pid = self.by_key.get((brand or "", name))
+        if pid is None:
+            raise NotFound(f"unknown product {brand!r} {name!r}")
+        return pid
+
+    def history(self, pid: int, region=DEFAULT_REGION, start=None, end=None) -> dict:
+        lo, hi = self.ranges.get((region, pid), (0, 0))
+        dates = self.dates[lo:hi]
+        # Dates are sorted within the range, so bounds are binary searches
+        a = lo + (int(np.searchsorted(dates, start, "left")) if start else 0)
+        b = lo + (int(np.searchsorted(dates, end, "right")) if end else hi - lo)
+        p = self.products[pid]
+        return {
+            "product_id": pid,
+            "brand": p["brand"],
+            "name": p["name"],
+            "region": region,
+            "dates": self.dates[a:b].tolist(),
+            "prices": self.prices[a:b].tolist(),
+            "weights": self.weights[a:b].tolist(),
+        }
+
+    # ---- anomalies ----------------------------------------------------------
+
+    def current_anomalies(self, region=DEFAULT_REGION, direction=None):
+        rows = [a for a in self.anomalies if a["region"] == region]
+        if direction == "lower":
+            rows = [a for a in rows if (a["pct_diff_vs_30d_median"] or 0) < 0]
+        elif direction == "higher":
+            rows = [a for a in rows if (a["pct_diff_vs_30d_median"] or 0) > 0]
+        elif direction is not None:
+            raise QueryError("direction must be 'lower' or 'higher'")
+        return {"file": self.anomalies_file, "anomalies": rows}
+
+
+class QueryService:
+    """Holds the current PriceIndex, swaps in a new one when the data changes, and caches responses."""
+
+    def __init__(self, store_dir: Path = STORE_DIR, data_dir: Path = DATA_DIR,
+                 reload_seconds=RELOAD_SECONDS, cache_entries=CACHE_ENTRIES):
+        self.store_dir, self.data_dir = Path(store_dir), Path(data_dir)
+        self.reload_seconds = reload_seconds
+        self.cache = ResponseCache(cache_entries)
+        self._reload_lock = threading.Lock()
+        self.index = PriceIndex(self.store_dir, self.data_dir)
+        self._checked = time.monotonic()
+
+    def current_index(self) -> PriceIndex:
+        if time.monotonic() - self._checked >= self.reload_seconds and self._reload_lock.acquire(blocking=False):
+            # One thread rebuilds while the others keep answering from the old index
+            try:
+                self._checked = time.monotonic()
+                if data_version(self.store_dir, self.data_dir) != self.index.version:
+                    self.index = PriceIndex(self.store_dir, self.data_dir)
+            finally:
+                self._reload_lock.release()
+        return self.index
+
+    def handle(self, path: str, params: dict) -> bytes:
+        """Encoded JSON body for one request; raises QueryError / NotFound."""
+        index = self.current_index()
+        key = (index.version, path, tuple(sorted((k, tuple(v)) for k, v in params.items())))
+        body = self.cache.get(key)
+        if body is None:
+            body = json.dumps(self._dispatch(index, path, params), separators=(",", ":")).encode("utf-8")
+            self.cache.put(key, body)
+        return body
+
+    def _dispatch(self, index: PriceIndex, path: str, params: dict):
+        def one(name, default=None):
+            values = params.get(name)
+            return values[-1] if values else default
+
+        def integer(name, default=None, cap=None, minimum=1):
+            raw = one(name)
+            if raw is None:
+                return default
+            try:
+                value = int(raw)
+            except ValueError:
+                raise QueryError(f"{name} must be an integer") from None
+            if value < minimum:
+                raise QueryError(f"{name} must be at least {minimum}")
+            return min(value, cap) if cap else value
+
+        def iso_date(name):
+            # Normalized back to YYYY-MM-DD, the form the index's dates are stored in
+            raw = one(name)
+            if raw is None:
+                return None
+            try:
+                return date.fromisoformat(raw).isoformat()
+            except ValueError:
+                raise QueryError(f"{name} must be a date (YYYY-MM-DD)") from None
+
+        region = one("region", DEFAULT_REGION)
+        start, end = iso_date("start"), iso_date("end")
+
+        if path == "/search":
+            results = index.search(one("q", ""), integer("limit", 50, MAX_LIMIT))
+            return {"count": len(results), "results": results}
+
+        if path == "/history":
+            pid = integer("product_id", minimum=0)  # ids start at 0
+            if pid is None and one("name") is None:
+                raise QueryError("pass product_id, or brand and name")
+            pid = index.resolve(pid, one("brand"), one("name"))
+            return index.history(pid, region, start, end)
+
+        if path == "/history/batch":
+            try:
+                ids = [int(i) for i in one("ids", "").split(",") if i.strip()]
+            except ValueError:
+                raise QueryError("ids must be comma-separated integers") from None
+            if not ids or len(ids) > MAX_BATCH:
+                raise QueryError(f"pass between 1 and {MAX_BATCH} ids")
+            return {
+                "histories": [index.history(i, region, start, end) for i in ids if i in index.products],
+                "unknown": [i for i in ids if i not in index.products],
+            }
+
+        if path == "/anomalies":
+            return index.current_anomalies(region, one("direction"))
+
+        if path == "/health":
+            return {
+                "version": index.version,
+                "updated": index.updated,
+                "products": len(index.products),
+                "rows": len(index.prices),
+                "anomalies_file": index.anomalies_file,
+                "cache_hits": self.cache.hits,
+                "cache_misses": self.cache.misses,
+            }
+
+        raise NotFound(f"no endpoint {path}")
+
+
+def make_handler(service: QueryService):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body are separate writes; with Nagle on, keep-alive clients wait ~40 ms per request
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            try:
+                body, status = service.handle(url.path.rstrip("/") or "/", parse_qs(url.query)), 200
+            except QueryError as e:
+                body, status = json.dumps({"error": str(e)}).encode("utf-8"), 400
+            except NotFound as e:
+                body, status = json.dumps({"error": str(e)}).encode("utf-8"), 404
+            except Exception as e:
+                # A bug in one endpoint must still answer, or keep-alive clients hang
+                self.log_error("%s failed: %r", self.path, e)
+                body, status = json.dumps({"error": "internal error"}).encode("utf-8"), 500
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # one line per request is too noisy under load
+
+    return Handler
+
+
+def serve(host="127.0.0.1", port=8765, store_dir: Path = STORE_DIR, data_dir: Path = DATA_DIR) -> ThreadingHTTPServer:
+    """Build the indexes and return a ready (not yet started) server; call serve_forever() on it."""
+    service = QueryService(store_dir, data_dir)
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve price data over HTTP/JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--store", default=str(STORE_DIR))
+    parser.add_argument("--data", default=str(DATA_DIR))
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, Path(args.store), Path(args.data))
+    index = server.service.index
+    print(f"Serving {len(index.products)} products, {len(index.prices)} rows on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# search_tokens.py
+"""
+Product search rules shared by the dashboard search box and query_service.
+
+A product matches a query when every query token matches one of its tokens,
+either exactly or, for tokens of 4+ characters, as a prefix in either
+direction covering at least 80% of the longer token.
+"""
+import re
+
+
+def normalize_text_to_tokens(text: str):
+    # lower case
+    text = str(text).lower()
+    # normalize & ↔ and
+    text = text.replace("&", " and ")
+    # keep only letters/numbers, turn others into spaces
+    text = re.sub(r"[^a-z0-9]+", " ", text)
+    tokens = [t for t in text.split() if t]
+    return set(tokens)
+
+
+def query_tokens(query: str):
+    """
+    Tokens of a search query. A query with no letters or digits of its own
+    has none: "&" alone would otherwise become "and" and match every
+    product with an "&" or "and" in its name.
+    """
+    if not re.search(r"[a-z0-9]", str(query), re.IGNORECASE):
+        return set()
+    return normalize_text_to_tokens(query)
+
+
+def product_matches_tokens(product_tokens: set[str], query_tokens: set[str]) -> bool:
+    if not query_tokens:
+        return False
+
+    for q in query_tokens:
+        found_for_q = False
+        for t in product_tokens:
+            # exact match always allowed
+            if t == q:
+                found_for_q = True
+                break
+
+            # partial match only if both are reasonably long
+            if len(q) >= 4 and len(t) >= 4:
+                # require prefix match in either direction
+                if t.startswith(q) or q.startswith(t):
+                    # and require at least 80% length overlap
+                    shorter = min(len(q), len(t))
+                    longer = max(len(q), len(t))
+                    if shorter / longer >= 0.8:
+                        found_for_q = True
+                        break
+
+        if not found_for_q:
+            return False
+
+    return True
@@ -0,0 +1,142 @@
+# streaming.py
+"""
+Streaming mode for the daily job: downstream work starts on each category
+as soon as it is scraped instead of after all of them.
+
+    scrape_aldi_data ──(region, csv_path)──> asyncio.Queue ──> StreamingDay.ingest
+                                                                 upsert the CSV into today's partition
+                                                                 score that category's products
+
+The consumer runs its pandas/sklearn work in a worker thread
+(asyncio.to_thread), so the event loop keeps driving the browser while a
+category is normalized and scored. Each ingest reads, hashes and normalizes
+only the CSV it was handed and upserts it into today's partition
+(compact_data.DayAppender); categories that arrived earlier are not read
+again. It then scores the category's products from the store's last
+window_days days, which fills the incremental anomaly cache while the
+remaining categories are still being scraped.
+
+When the scrape is done, finish() checks today's partition with
+compact(days=[today]). That hashes today's files only and is a no-op
+unless a CSV turned up that never went through the queue. It then runs one
+pass over every product in the window. It gives the same output and state file as
+get_anomalies(incremental=True), but every verdict whose window didn't
+change since its category was scored comes from the cache. The
+IsolationForest fits have already happened during the scrape, so what is
+left after the last category is a single array pass.
+
+Scores come from the store (one row per product and day) rather than from
+the combined CSV. A product listed in two categories on the same day counts
+once.
+
+Usage:
+    python streaming.py [--data data] [--store store]
+"""
+import os
+import asyncio
+import argparse
+from pathlib import Path
+from datetime import date, timedelta
+
+from aldi import scrape_aldi_data
+from compact_data import DATA_DIR, STORE_DIR, DayAppender, compact, load_prices
+from concat_data import (
+    ANOMALY_STATE_FILE,
+    MANUAL_THRESHOLD_PCT,
+    _load_anomaly_state,
+    _save_anomaly_state,
+    _score_incremental,
+    prepare_anomaly_frame,
+    write_anomalies,
+)
+from instrumentation import count, stage
+from windows import DEFAULT_WINDOW_DAYS
+
+SCORE_COLS = ["region", "brand", "name", "weight", "price", "date"]
+
+
+class StreamingDay:
+    """Store updates and anomaly scoring for one day, fed one finished category at a time."""
+
+    def __init__(self, base_dir, store_dir, today=None, manual_threshold_pct=MANUAL_THRESHOLD_PCT,
+                 window_days=DEFAULT_WINDOW_DAYS):
+        self.base_dir = Path(base_dir)
+        self.store_dir = Path(store_dir)
+        self.today = today or date.today()
+        self.threshold = manual_threshold_pct
+        self.window_days = window_days
+        self.state_path = os.path.join(self.base_dir, ANOMALY_STATE_FILE)
+        # Verdicts from the last run, refreshed with every category scored today
+        self.cache = _load_anomaly_state(self.state_path, self.threshold, window_days)
+        self.appender = DayAppender(self.base_dir, self.store_dir, self.today)
+        self.categories = 0
+
+    def _window(self, **filters):
+        prices = load_prices(self.store_dir, self.today - timedelta(days=self.window_days), self.today, **filters)
+        prices = prices.assign(date=prices["date"].astype("datetime64[ns]"))
+        return prepare_anomaly_frame(prices[SCORE_COLS])
+
+    def ingest(self, region: str, csv_path: Path):
+        """Fold one finished category CSV into the store and score its products."""
+        category = Path(csv_path).stem.removesuffix("_nutrition")
+        with stage("stream.compact", region=region, category=category):
+            self.appender.add(csv_path)
+
+        with stage("stream.score", region=region, category=category):
+            today_rows = load_prices(self.store_dir, self.today, self.today, region=region)
+            ids = today_rows.loc[today_rows["category"] == category, "product_id"].unique()
+            count("products", len(ids))
+            if len(ids):
+                scored = {}
+                _score_incremental(self._window(product_ids=ids, region=region), self.cache, scored,
+                                   self.threshold, self.window_days)
+                self.cache.update(scored)
+        self.categories += 1
+
+    def finish(self):
+        """Score every product in the window (cached verdicts reused) and write the day's anomalies."""
+        with stage("stream.finish", categories=self.categories):
+            # Picks up any of today's CSVs that bypassed the queue; otherwise only hashes
+            compact(self.base_dir, self.store_dir, days=[self.today])
+            current = {}
+            results = _score_incremental(self._window(), self.cache, current, self.threshold, self.window_days)
+            _save_anomaly_state(self.state_path, current, self.threshold, self.window_days)
+
+        today_str = self.today.strftime("%Y%m%d")
+        folder = self.base_dir / today_str
+        folder.mkdir(parents=True, exist_ok=True)
+        return write_anomalies(results, str(folder), today_str, self.window_days)
+
+
+async def stream_day(base_dir=DATA_DIR, store_dir=STORE_DIR, **scrape_kwargs):
+    """
+    Scrape today's categories while the store and anomaly scores are updated
+    from the ones already finished. Returns today's anomalies DataFrame.
+    """
+    day = StreamingDay(base_dir, store_dir)
+    finished = asyncio.Queue()
+
+    async def consume():
+        while (item := await finished.get()) is not None:
+            await asyncio.to_thread(day.ingest, *item)
+
+    consumer = asyncio.create_task(consume())
+    try:
+        with stage("scrape"):
+            await scrape_aldi_data(str(base_dir), finished=finished, **scrape_kwargs)
+    finally:
+        await finished.put(None)
+        await consumer
+    return await asyncio.to_thread(day.finish)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape today's data with overlapped store updates and scoring.")
+    parser.add_argument("--data", default=str(DATA_DIR))
+    parser.add_argument("--store", default=str(STORE_DIR))
+    args = parser.parse_args()
+    asyncio.run(stream_day(Path(args.data), Path(args.store)))
+
+
+if __name__ == "__main__":
+    main()
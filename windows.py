@@ -0,0 +1,232 @@
+# windows.py
+"""
+Sliding time windows over one product's price history.
+
+A window of `days` days ending at day t holds every observation with
+day > t - days, or day >= t - days with include_start=True (the anomaly
+window "latest date minus 30 days, inclusive"). Days are integer day
+numbers: date.toordinal() or datetime64[D] as int.
+
+Each SlidingWindow is updated one observation at a time, and every
+observation enters once and leaves once. Costs per pushed day, with k the
+number of distinct prices in the window:
+
+    count, mean                O(1)        running count and sum
+    min, max                   amortized O(1)
+                                           monotonic deques (values that can
+                                           never be the extreme again are
+                                           dropped on push)
+    unique_median, unique_values
+                               O(log k) search + O(k) list insert/delete
+                                           OrderStatistics: the window's
+                                           distinct values kept sorted
+                                           (bisect on a plain list), each with
+                                           the positions it occurs at
+                                           (a product has a handful of
+                                           distinct prices, so k is small)
+
+These costs are per day only while one window keeps sliding, e.g. in
+rolling_window_stats() over a whole history. The pipeline entry points
+(get_anomalies, _score_incremental, make_dashboard) build a fresh window per
+product on each run and push that product's rows in the window, which is
+O(window) per product, the same as the masks they replaced. What they gain
+is one definition of "the last N days" and a window length that is a
+parameter (7/30/90) instead of a constant.
+
+ProductWindows feeds the same observations to several lengths at once (by
+default DEFAULT_WINDOWS), and rolling_window_stats() turns a whole history
+into per-day columns such as mean_7, min_30 or unique_median_90.
+
+    w = SlidingWindow(30, include_start=True)
+    for day, price in zip(days, prices):
+        w.push(day, price)
+    w.unique_values(), w.unique_median(), w.mean()
+"""
+import bisect
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_WINDOW_DAYS = 30
+DEFAULT_WINDOWS = (7, 30, 90)
+STATS = ("count", "mean", "min", "max", "unique_median")
+
+
+class MonotonicDeque:
+    """Min (or max with largest=True) of a sliding window in amortized O(1)."""
+
+    def __init__(self, largest: bool = False):
+        self.largest = largest
+        self._q = deque()  # (seq, value), values monotonic from the front
+
+    def push(self, seq: int, value: float):
+        q = self._q
+        if self.largest:
+            while q and q[-1][1] <= value:
+                q.pop()
+        else:
+            while q and q[-1][1] >= value:
+                q.pop()
+        q.append((seq, value))
+
+    def expire(self, oldest_seq: int):
+        """Drop entries pushed before oldest_seq."""
+        q = self._q
+        while q and q[0][0] < oldest_seq:
+            q.popleft()
+
+    def value(self):
+        return self._q[0][1] if self._q else None
+
+
+class OrderStatistics:
+    """
+    Distinct values of a window in sorted order, with the positions each one
+    occurs at. Adding or removing an occurrence of a known value is O(1). A
+    new or vanished value costs a bisect (O(log k)) plus a list insert/delete
+    (O(k) memmove); rank queries index the list in O(1).
+    """
+
+    def __init__(self):
+        self.sorted = []  # distinct values, ascending
+        self.seen = {}    # value -> deque of seq numbers, oldest first
+
+    def __len__(self):
+        return len(self.sorted)
+
+    def add(self, seq: int, value: float):
+        occurrences = self.seen.get(value)
+        if occurrences is None:
+            bisect.insort(self.sorted, value)
+            occurrences = self.seen[value] = deque()
+        occurrences.append(seq)
+
+    def remove_oldest(self, value: float):
+        """Remove value's oldest occurrence (the one that just left the window)."""
+        occurrences = self.seen[value]
+        occurrences.popleft()
+        if not occurrences:
+            del self.seen[value]
+            del self.sorted[bisect.bisect_left(self.sorted, value)]
+
+    def kth(self, k: int):
+        """k-th smallest distinct value (0-based)."""
+        return self.sorted[k]
+
+    def median(self):
+        """Median of the distinct values (same as np.median(unique values)); None when empty."""
+        n = len(self.sorted)
+        if n == 0:
+            return None
+        mid = n // 2
+        if n % 2:
+            return float(self.sorted[mid])
+        return float(np.mean([self.sorted[mid - 1], self.sorted[mid]]))
+
+    def first_seen(self):
+        """Distinct values in the order they first occur in the window."""
+        return sorted(self.seen, key=lambda v: self.seen[v][0])
+
+
+class SlidingWindow:
+    """Observations of the last `days` days, updated one (day, value) at a time."""
+
+    def __init__(self, days: int = DEFAULT_WINDOW_DAYS, include_start: bool = False):
+        self.days = days
+        self.include_start = include_start
+        self._rows = deque()  # (seq, day, value)
+        self._seq = 0
+        self._sum = 0.0
+        self._min = MonotonicDeque()
+        self._max = MonotonicDeque(largest=True)
+        self._distinct = OrderStatistics()
+
+    def advance(self, day: int):
+        """Move the window's end to day, dropping observations that fell out of it."""
+        cutoff = day - self.days
+        rows = self._rows
+        while rows and (rows[0][1] < cutoff or (rows[0][1] == cutoff and not self.include_start)):
+            _, _, value = rows.popleft()
+            self._sum -= value
+            self._distinct.remove_oldest(value)
+        if rows:
+            self._min.expire(rows[0][0])
+            self._max.expire(rows[0][0])
+        else:
+            self._min.expire(self._seq)
+            self._max.expire(self._seq)
+
+    def push(self, day: int, value: float):
+        """Add an observation on day (days must not decrease) and end the window there."""
+        value = float(value)
+        self.advance(day)
+        seq = self._seq
+        self._seq += 1
+        self._rows.append((seq, day, value))
+        self._sum += value
+        self._min.push(seq, value)
+        self._max.push(seq, value)
+        self._distinct.add(seq, value)
+
+    def count(self) -> int:
+        return len(self._rows)
+
+    def mean(self):
+        return self._sum / len(self._rows) if self._rows else None
+
+    def min(self):
+        return self._min.value()
+
+    def max(self):
+        return self._max.value()
+
+    def unique_median(self):
+        return self._distinct.median()
+
+    def unique_values(self):
+        """Distinct values in first-seen order (what the anomaly scorer compares against)."""
+        return self._distinct.first_seen()
+
+    def stats(self) -> dict:
+        return {name: getattr(self, name)() for name in STATS}
+
+
+class ProductWindows:
+    """Several window lengths over the same product, fed once per observation."""
+
+    def __init__(self, windows=DEFAULT_WINDOWS, include_start: bool = False):
+        self.windows = {days: SlidingWindow(days, include_start) for days in windows}
+
+    def push(self, day: int, value: float):
+        for window in self.windows.values():
+            window.push(day, value)
+
+    def advance(self, day: int):
+        for window in self.windows.values():
+            window.advance(day)
+
+    def __getitem__(self, days: int) -> SlidingWindow:
+        return self.windows[days]
+
+    def stats(self) -> dict:
+        """{f"{stat}_{days}": value} for every window length."""
+        return {f"{name}_{days}": value for days, w in self.windows.items() for name, value in w.stats().items()}
+
+
+def day_numbers(dates) -> np.ndarray:
+    """Integer day numbers for an array/Series of dates or timestamps."""
+    return pd.to_datetime(pd.Series(dates)).to_numpy().astype("datetime64[D]").astype(np.int64)
+
+
+def rolling_window_stats(dates, prices, windows=DEFAULT_WINDOWS, include_start: bool = False) -> pd.DataFrame:
+    """
+    One row per observation (dates ascending) with the stats of every window
+    ending at it: count_7, mean_7, min_7, max_7, unique_median_7, ... .
+    """
+    tracker = ProductWindows(windows, include_start)
+    rows = []
+    for day, price in zip(day_numbers(dates), np.asarray(prices, dtype=float)):
+        tracker.push(int(day), price)
+        rows.append(tracker.stats())
+    return pd.DataFrame(rows, columns=[f"{name}_{days}" for days in windows for name in STATS])